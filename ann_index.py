@@ -0,0 +1,150 @@
+"""
+Index approximate nearest neighbour (IVF) untuk galeri wajah yang sangat besar
+Implementasi murni NumPy: k-means kasar + inverted list per cluster
+"""
+import numpy as np
+
+# Batas sampel untuk training k-means (per centroid)
+TRAINING_POINTS_PER_LIST = 64
+KMEANS_ITERATIONS = 10
+
+
+def _sq_distances(vectors, sq_norms, queries):
+    """Jarak euclidean kuadrat (Q, N) dari queries ke vectors"""
+    q_norms = np.einsum('ij,ij->i', queries, queries)
+    d = sq_norms[None, :] - 2.0 * (queries @ vectors.T)
+    d += q_norms[:, None]
+    return d
+
+
+class IVFIndex:
+    """Inverted file index: setiap baris galeri dimasukkan ke list milik
+    centroid terdekat. Pencarian hanya memindai nprobe list terdekat.
+
+    Index hanya menyimpan nomor baris; vektor tetap dibaca dari matriks galeri
+    sehingga jarak akhir kandidat dihitung secara exact.
+    """
+
+    def __init__(self, centroids, nprobe=8):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.centroid_sq_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        self.nprobe = nprobe
+        nlist = len(self.centroids)
+        self._lists = [np.empty(16, dtype=np.int64) for _ in range(nlist)]
+        self._list_sizes = np.zeros(nlist, dtype=np.int64)
+        self._row_list = np.empty(0, dtype=np.int64)
+        self._row_pos = np.empty(0, dtype=np.int64)
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @classmethod
+    def train(cls, encodings, nlist, nprobe=8, seed=0):
+        """Membangun centroid dengan k-means (Lloyd) pada sampel galeri"""
+        encodings = np.asarray(encodings, dtype=np.float32)
+        n = len(encodings)
+        nlist = max(1, min(int(nlist), n))
+        rng = np.random.default_rng(seed)
+
+        sample_size = min(n, nlist * TRAINING_POINTS_PER_LIST)
+        sample = encodings[rng.choice(n, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(KMEANS_ITERATIONS):
+            c_norms = np.einsum('ij,ij->i', centroids, centroids)
+            assign = np.argmin(_sq_distances(centroids, c_norms, sample), axis=1)
+            counts = np.bincount(assign, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+            # Cluster kosong diisi ulang dengan titik sampel acak
+            empty = int((~filled).sum())
+            if empty:
+                centroids[~filled] = sample[rng.choice(sample_size, empty, replace=False)]
+
+        index = cls(centroids, nprobe)
+        index.assign_all(encodings)
+        return index
+
+    def assign_all(self, encodings):
+        """Mengisi ulang semua inverted list untuk baris 0..N-1"""
+        encodings = np.asarray(encodings, dtype=np.float32)
+        n = len(encodings)
+        assign = self._nearest_lists(encodings, 1)[:, 0] if n else np.empty(0, dtype=np.int64)
+
+        order = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=self.nlist)
+        self._row_list = np.empty(max(n, 16), dtype=np.int64)
+        self._row_pos = np.empty(max(n, 16), dtype=np.int64)
+        self._row_list[:n] = assign
+
+        start = 0
+        for list_id, count in enumerate(counts):
+            rows = order[start:start + count]
+            self._lists[list_id] = np.empty(max(count * 2, 16), dtype=np.int64)
+            self._lists[list_id][:count] = rows
+            self._row_pos[rows] = np.arange(count)
+            start += count
+        self._list_sizes = counts.astype(np.int64)
+
+    def _nearest_lists(self, queries, nprobe):
+        d = _sq_distances(self.centroids, self.centroid_sq_norms, queries)
+        nprobe = min(nprobe, self.nlist)
+        if nprobe < self.nlist:
+            return np.argpartition(d, nprobe - 1, axis=1)[:, :nprobe]
+        return np.broadcast_to(np.arange(self.nlist), d.shape)
+
+    def _ensure_rows(self, row):
+        if row < len(self._row_list):
+            return
+        size = max(row + 1, len(self._row_list) * 2)
+        for name in ('_row_list', '_row_pos'):
+            old = getattr(self, name)
+            new = np.empty(size, dtype=np.int64)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, row, encoding):
+        """Memasukkan satu baris galeri ke list centroid terdekat"""
+        list_id = int(self._nearest_lists(np.asarray(encoding, dtype=np.float32)[None, :], 1)[0, 0])
+        self._ensure_rows(row)
+        size = self._list_sizes[list_id]
+        members = self._lists[list_id]
+        if size == len(members):
+            grown = np.empty(len(members) * 2, dtype=np.int64)
+            grown[:size] = members
+            self._lists[list_id] = members = grown
+        members[size] = row
+        self._row_list[row] = list_id
+        self._row_pos[row] = size
+        self._list_sizes[list_id] = size + 1
+
+    def remove(self, row):
+        """Mengeluarkan satu baris dari list-nya (anggota terakhir mengisi posisi kosong)"""
+        list_id = self._row_list[row]
+        pos = self._row_pos[row]
+        last = self._list_sizes[list_id] - 1
+        members = self._lists[list_id]
+        moved = members[last]
+        members[pos] = moved
+        self._row_pos[moved] = pos
+        self._list_sizes[list_id] = last
+
+    def move(self, old_row, new_row):
+        """Memperbarui nomor baris setelah galeri memindah baris old_row ke new_row"""
+        self._ensure_rows(new_row)
+        list_id = self._row_list[old_row]
+        pos = self._row_pos[old_row]
+        self._lists[list_id][pos] = new_row
+        self._row_list[new_row] = list_id
+        self._row_pos[new_row] = pos
+
+    def candidates(self, query, nprobe=None):
+        """Nomor baris galeri di nprobe list terdekat dari query"""
+        probe = self._nearest_lists(query[None, :], nprobe or self.nprobe)[0]
+        parts = [self._lists[l][:self._list_sizes[l]] for l in probe]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(parts)
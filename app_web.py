@@ -2,50 +2,197 @@
 Aplikasi Web - Sistem Absensi Face Recognition
 Menggunakan Flask
 """
-from flask import Flask, render_template, request, jsonify, redirect, url_for, Response
+from flask import Flask, render_template, request, jsonify, redirect, url_for, Response, stream_with_context, g
 from datetime import datetime
-import cv2
-import pickle
 import os
+import io
+import csv
+import json
 import base64
-import numpy as np
-import face_recognition as fr
+import hashlib
+import time
 
+import numpy as np
 import config
 from database import DatabaseManager
+from attendance_journal import AttendanceJournal
+from dashboard_stats import DashboardStats
+from event_broadcaster import EventBroadcaster
 from face_recognition_module import FaceRecognitionModule
+from encoding_format import encode_face_encoding, decode_face_encodings
+from embedding_index import EmbeddingIndex
+from recognition_service import RecognitionService, QueueFullError, InferenceTimeoutError
+from recognition_batcher import RecognitionBatcher
+from recognition_cache import RecognitionCache
+from camera_stream import CameraStream
+from metrics import metrics, SlowRequestProfiler
+from pipeline_warmup import PipelineWarmup
+from recognition_jobs import RecognitionJobs
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'absensi-face-recognition-2026'
 
+MAX_MULTIPART_OVERHEAD = 64 * 1024  # Ruang untuk field form lain di request multipart
+
+# Batas body request, ditegakkan Werkzeug saat stream dibaca (juga tanpa Content-Length / chunked).
+# Gambar base64 data URL ~4/3 ukuran JPEG.
+app.config['MAX_CONTENT_LENGTH'] = config.MAX_UPLOAD_BYTES * 4 // 3 + MAX_MULTIPART_OVERHEAD
+
+# Worker inferensi (start method spawn/forkserver) mengimpor ulang script utama sebagai
+# __mp_main__; di process itu database, journal dan warm-up tidak dijalankan.
+# multiprocessing.parent_process() masih None saat import tersebut, jadi cek __name__.
+SERVING_PROCESS = __name__ != '__mp_main__'
+
 # Inisialisasi
-db = DatabaseManager()
+db = DatabaseManager() if SERVING_PROCESS else None
 face_rec = FaceRecognitionModule()
+recognition_service = RecognitionService()
+recognition_batcher = RecognitionBatcher(recognition_service, face_rec)
+recognition_cache = RecognitionCache(face_rec)
+# Job asinkron ditolak saat semua slot worker inferensi terpakai
+recognition_jobs = RecognitionJobs(
+    saturated=lambda: recognition_service.queue_depth >= recognition_service.queue_size)
+
+# Pencatat absensi: langsung ke database, atau write-behind lewat journal
+attendance_journal = AttendanceJournal(db) if config.ATTENDANCE_WRITE_BEHIND and SERVING_PROCESS else None
+attendance_recorder = attendance_journal or db
+dashboard_stats = DashboardStats(db)
+attendance_events = EventBroadcaster()
+
+
+def load_gallery():
+    """Memuat galeri wajah saat startup (cold start)"""
+    if not config.EMBEDDING_INDEX_ENABLED:
+        face_rec.load_known_faces(db.get_all_face_encodings(), load_templates())
+        return
+    
+    # Pakai index memmap jika konsisten dengan database, jika tidak bangun ulang
+    db_version, db_count = db.get_gallery_state(include_templates=gallery_has_template_rows())
+    index = EmbeddingIndex.open(config.EMBEDDING_INDEX_PATH)
+    if index is not None and index.is_consistent(db_version, db_count):
+        face_rec.attach_index(index)
+    else:
+        print("Index embedding tidak sesuai database, membangun ulang...")
+        del index
+        face_rec.load_known_faces(db.get_all_face_encodings(), load_templates())
+        face_rec.build_index(config.EMBEDDING_INDEX_PATH, db_version)
+
+
+def load_templates():
+    """Template wajah tambahan untuk galeri (kosong jika fitur dimatikan)"""
+    if config.MAX_TEMPLATES_PER_EMPLOYEE <= 1:
+        return []
+    return db.get_all_face_templates()
+
+
+def gallery_has_template_rows():
+    """Pada mode 'min' setiap template menjadi baris galeri sendiri"""
+    return config.MAX_TEMPLATES_PER_EMPLOYEE > 1 and face_rec.template_matching == 'min'
+
+
+def add_face_template(employee_id, face_encoding, source):
+    """Menyimpan template wajah baru lalu memperbarui baris galeri pegawai"""
+    if not db.add_face_template(employee_id, encode_face_encoding(face_encoding), source):
+        return False
+    
+    face_encodings, valid = decode_face_encodings(db.get_face_templates(employee_id))
+    face_rec.set_templates(employee_id, face_rec.get_name(employee_id), face_encodings[valid])
+    if config.EMBEDDING_INDEX_ENABLED:
+        face_rec.set_index_version(db.get_gallery_state()[0])
+    return True
+
+
+# Galeri wajah dan model dlib dimuat di background: dashboard, daftar pegawai
+# dan riwayat sudah bisa dibuka sebelum pipeline pengenalan siap
+pipeline_warmup = PipelineWarmup([
+    ('gallery', load_gallery),
+    ('models', recognition_service.warm_up),
+])
+# Warm-up hanya di process yang melayani request (reloader debug Flask menjalankan modul ini dua kali)
+if SERVING_PROCESS and (__name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+    pipeline_warmup.start()
+    if config.WARMUP_MODE == 'blocking':
+        pipeline_warmup.wait()
+
 
-# Load face data
-face_data = db.get_all_face_encodings()
-face_rec.load_known_faces(face_data)
+def pipeline_unavailable_payload(step=None, timeout=None):
+    """Payload error jika pipeline (atau satu langkahnya) belum siap; None jika siap"""
+    if pipeline_warmup.wait(config.WARMUP_WAIT_TIMEOUT if timeout is None else timeout, step):
+        return None
+    if pipeline_warmup.state == 'failed':
+        message = 'Sistem pengenalan wajah gagal dimuat, periksa log server.'
+    else:
+        message = 'Sistem pengenalan wajah sedang dimuat, silakan coba lagi.'
+    return {'success': False, 'message': message}
 
-# Variable global untuk streaming video
-camera = None
+
+def pipeline_unavailable(step=None):
+    """Respons 503 jika pipeline (atau satu langkahnya) belum siap; None jika siap"""
+    payload = pipeline_unavailable_payload(step)
+    if payload is None:
+        return None
+    return jsonify(payload), 503, {'Retry-After': '5'}
+
+# Kamera untuk streaming video, dibagi ke semua client
+camera_stream = CameraStream()
+
+# Metrik yang dibaca saat /metrics diminta
+metrics.register('absensi_pipeline_ready', 'Pipeline pengenalan wajah sudah siap (1) atau belum (0)',
+                 lambda: int(pipeline_warmup.ready))
+metrics.register('absensi_gallery_size', 'Jumlah baris wajah di galeri', lambda: len(face_rec))
+metrics.register('absensi_inference_queue_depth', 'Job inferensi yang menunggu atau berjalan',
+                 lambda: recognition_service.queue_depth)
+metrics.register('absensi_batch_queue_depth', 'Request yang menunggu dikumpulkan menjadi batch',
+                 lambda: recognition_batcher.stats()['queue_depth'])
+metrics.register('absensi_batch_mean_size', 'Rata-rata ukuran batch pengenalan',
+                 lambda: recognition_batcher.stats()['mean_batch_size'])
+metrics.register('absensi_recognition_cache_hits_total', 'Hit cache hasil pengenalan',
+                 lambda: recognition_cache.hits, 'counter')
+metrics.register('absensi_recognition_cache_misses_total', 'Miss cache hasil pengenalan',
+                 lambda: recognition_cache.misses, 'counter')
+metrics.register('absensi_recognition_jobs_pending', 'Job pengenalan asinkron yang belum selesai',
+                 lambda: recognition_jobs.pending)
+metrics.register('absensi_sse_clients', 'Dashboard yang terhubung lewat SSE',
+                 lambda: attendance_events.client_count)
+metrics.register('absensi_stream_clients', 'Client streaming video', lambda: camera_stream.client_count)
+
+request_profiler = SlowRequestProfiler()
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.request_profile = request_profiler.start()
+
+
+@app.after_request
+def record_request_time(response):
+    started = g.pop('request_started', None)
+    profile = g.pop('request_profile', None)
+    if started is None:
+        return response
+    
+    elapsed = time.perf_counter() - started
+    if request.endpoint not in (None, 'static'):
+        metrics.request_seconds.observe(request.endpoint, elapsed)
+    request_profiler.stop(profile, elapsed, request.endpoint or 'unknown')
+    return response
+
+
+@app.teardown_request
+def stop_request_profile(exc):
+    # after_request tidak dipanggil jika terjadi exception
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        profile.disable()
 
 
 @app.route('/')
 def index():
     """Halaman utama / dashboard"""
-    # Statistik
-    employees = db.get_all_employees()
-    attendance_today = db.get_attendance_today()
-    
-    total_employees = len(employees)
-    present_today = len(attendance_today)
-    
-    stats = {
-        'total_employees': total_employees,
-        'present_today': present_today,
-        'absent_today': total_employees - present_today,
-        'date': datetime.now().strftime('%d %B %Y')
-    }
+    # Statistik (dari cache, diperbarui setiap ada absensi / perubahan pegawai)
+    stats, attendance_today, _ = dashboard_stats.snapshot()
+    stats = dict(stats, date=datetime.now().strftime('%d %B %Y'))
     
     return render_template('dashboard.html', stats=stats, attendance=attendance_today)
 
@@ -56,72 +203,140 @@ def registrasi():
     return render_template('registrasi.html')
 
 
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({'success': False, 'message': 'Ukuran gambar terlalu besar!'}), 413
+
+
+def read_image_upload():
+    """Membaca JPEG mentah dari multipart blob (field 'image') atau body
+    application/octet-stream. Mengembalikan (image_bytes, error_response)."""
+    too_large = (jsonify({'success': False, 'message': 'Ukuran gambar terlalu besar!'}), 413)
+    max_bytes = config.MAX_UPLOAD_BYTES
+    
+    if request.content_length is not None and request.content_length > max_bytes + MAX_MULTIPART_OVERHEAD:
+        return None, too_large
+    
+    if request.mimetype == 'application/octet-stream':
+        # Baca paling banyak max_bytes + 1, body chunked tidak ditampung seluruhnya
+        image_bytes = request.stream.read(max_bytes + 1)
+    else:
+        upload = request.files.get('image')
+        image_bytes = upload.read(max_bytes + 1) if upload else b''
+    
+    if len(image_bytes) > max_bytes:
+        return None, too_large
+    if not image_bytes:
+        return None, jsonify({'success': False, 'message': 'Tidak ada gambar!'})
+    return image_bytes, None
+
+
+def decode_data_url(image_data):
+    """Decode gambar base64 data URL dari canvas.toDataURL"""
+    with metrics.timer('decode_base64'):
+        return base64.b64decode(image_data.split(',')[1])
+
+
 @app.route('/registrasi/submit', methods=['POST'])
 def registrasi_submit():
-    """Proses registrasi pegawai"""
+    """Proses registrasi pegawai (gambar base64 data URL)"""
+    employee_id = request.form.get('employee_id')
+    name = request.form.get('name')
+    department = request.form.get('department')
+    position = request.form.get('position')
+    image_data = request.form.get('image_data')
+    
+    if not all([employee_id, name, image_data]):
+        return jsonify({'success': False, 'message': 'Data tidak lengkap!'})
+    
     try:
-        employee_id = request.form.get('employee_id')
-        name = request.form.get('name')
-        department = request.form.get('department')
-        position = request.form.get('position')
-        image_data = request.form.get('image_data')
-        
-        if not all([employee_id, name, image_data]):
-            return jsonify({'success': False, 'message': 'Data tidak lengkap!'})
-        
-        # Decode base64 image
-        image_data = image_data.split(',')[1]
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        # Ekstrak face encoding
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        face_locations = fr.face_locations(rgb_image)
+        image_bytes = decode_data_url(image_data)
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+    
+    return process_registration(employee_id, name, department, position, image_bytes)
+
+
+@app.route('/registrasi/submit/binary', methods=['POST'])
+def registrasi_submit_binary():
+    """Proses registrasi pegawai (JPEG mentah: multipart blob atau octet-stream)"""
+    image_bytes, error = read_image_upload()
+    if error:
+        return error
+    
+    employee_id = request.values.get('employee_id')
+    name = request.values.get('name')
+    department = request.values.get('department')
+    position = request.values.get('position')
+    
+    if not all([employee_id, name]):
+        return jsonify({'success': False, 'message': 'Data tidak lengkap!'})
+    
+    return process_registration(employee_id, name, department, position, image_bytes)
+
+
+def process_registration(employee_id, name, department, position, image_bytes):
+    """Registrasi pegawai dari data JPEG"""
+    unavailable = pipeline_unavailable()
+    if unavailable is not None:
+        return unavailable
+    
+    try:
+        # Ekstrak face encoding (di worker pool) sekaligus cari wajah termirip
+        with metrics.timer('inference'):
+            face_locations, face_encodings, best = recognition_batcher.recognize(image_bytes)
         
         if len(face_locations) == 0:
             return jsonify({'success': False, 'message': 'Tidak ada wajah terdeteksi!'})
         
-        face_encodings = fr.face_encodings(rgb_image, face_locations)
         if len(face_encodings) == 0:
             return jsonify({'success': False, 'message': 'Gagal mengekstrak fitur wajah!'})
         
         face_encoding = face_encodings[0]
         
         # Validasi: cek apakah wajah sudah terdaftar
-        if len(face_rec.known_face_encodings) > 0:
-            face_distances = fr.face_distance(face_rec.known_face_encodings, face_encoding)
-            min_distance = np.min(face_distances)
+        if best:
+            similar_id, min_distance = best[0]
             
             if min_distance <= config.MAX_FACE_DISTANCE:
-                similar_idx = np.argmin(face_distances)
-                similar_name = face_rec.known_face_names[similar_idx]
+                similar_name = face_rec.get_name(similar_id)
                 return jsonify({
                     'success': False, 
                     'message': f'Wajah ini sudah terdaftar atas nama: {similar_name}! (similarity: {(1-min_distance)*100:.1f}%)'
                 })
         
-        # Simpan foto
+        # Simpan foto (data JPEG asli, tanpa decode/encode ulang)
         image_filename = f"{employee_id}_{name.replace(' ', '_')}.jpg"
         image_path = os.path.join(config.EMPLOYEE_IMAGES_DIR, image_filename)
-        cv2.imwrite(image_path, image)
+        with metrics.timer('save_image'), open(image_path, 'wb') as f:
+            f.write(image_bytes)
         
-        # Serialize face encoding
-        face_encoding_blob = pickle.dumps(face_encoding)
+        # Serialize face encoding (float32 mentah berheader versi)
+        face_encoding_blob = encode_face_encoding(face_encoding)
         
         # Simpan ke database
-        success = db.add_employee(employee_id, name, department, position, 
-                                  image_path, face_encoding_blob)
+        with metrics.timer('db_add_employee'):
+            success = db.add_employee(employee_id, name, department, position, 
+                                      image_path, face_encoding_blob,
+                                      hashlib.sha256(image_bytes).hexdigest())
         
         if success:
-            # Reload face data
-            face_data = db.get_all_face_encodings()
-            face_rec.load_known_faces(face_data)
+            dashboard_stats.employee_added(employee_id)
+            attendance_events.publish('stats', {'stats': dashboard_stats.counts()})
+            
+            # Tambahkan ke galeri tanpa reload seluruh data
+            face_rec.add_face(employee_id, name, face_encoding)
+            if config.EMBEDDING_INDEX_ENABLED:
+                face_rec.set_index_version(db.get_gallery_state()[0])
             
             return jsonify({'success': True, 'message': f'Pegawai {name} berhasil didaftarkan!'})
         else:
             return jsonify({'success': False, 'message': 'ID Pegawai sudah terdaftar!'})
             
+    except QueueFullError:
+        return jsonify({'success': False, 'message': 'Server sedang sibuk, silakan coba lagi.'}), 503
+    except InferenceTimeoutError:
+        return jsonify({'success': False, 'message': 'Pengenalan wajah terlalu lama, silakan coba lagi.'}), 504
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error: {str(e)}'})
 
@@ -134,74 +349,176 @@ def absensi():
 
 @app.route('/absensi/recognize', methods=['POST'])
 def absensi_recognize():
-    """Proses pengenalan wajah untuk absensi"""
+    """Proses pengenalan wajah untuk absensi (gambar base64 data URL)"""
+    attendance_type = request.form.get('type', 'check_in')
+    image_data = request.form.get('image_data')
+    
+    if not image_data:
+        return jsonify({'success': False, 'message': 'Tidak ada gambar!'})
+    
     try:
-        attendance_type = request.form.get('type', 'check_in')
-        image_data = request.form.get('image_data')
-        
-        if not image_data:
-            return jsonify({'success': False, 'message': 'Tidak ada gambar!'})
-        
-        # Decode base64 image
-        image_data = image_data.split(',')[1]
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        # Deteksi wajah
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        face_locations = fr.face_locations(rgb_image)
+        image_bytes = decode_data_url(image_data)
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+    
+    return process_recognition(attendance_type, image_bytes)
+
+
+@app.route('/absensi/recognize/binary', methods=['POST'])
+def absensi_recognize_binary():
+    """Proses pengenalan wajah untuk absensi (JPEG mentah: multipart blob atau octet-stream)"""
+    image_bytes, error = read_image_upload()
+    if error:
+        return error
+    
+    attendance_type = request.values.get('type', 'check_in')
+    return process_recognition(attendance_type, image_bytes)
+
+
+def recognition_async_requested():
+    """Mode asinkron untuk request ini: parameter async=1/0, default config.RECOGNITION_ASYNC"""
+    value = request.values.get('async')
+    if value is None:
+        return config.RECOGNITION_ASYNC
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def recognition_job_json(job):
+    """Status job pengenalan (dan hasilnya jika sudah selesai) ke dict JSON"""
+    done = job.done
+    data = {
+        'job_id': job.id,
+        'status': 'done' if done else job.status,
+        'poll_url': url_for('absensi_job', job_id=job.id)
+    }
+    if done:
+        payload, status_code = job.result
+        data['result'] = payload
+        data['status_code'] = status_code
+    return data
+
+
+@app.route('/absensi/jobs/<job_id>')
+def absensi_job(job_id):
+    """Hasil job pengenalan asinkron; ?wait=<detik> untuk long-polling.
+
+    200 jika selesai (hasil di field 'result'), 202 jika masih diproses,
+    404 jika job tidak ada atau sudah kedaluwarsa.
+    """
+    job = recognition_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Job tidak ditemukan atau sudah kedaluwarsa.'}), 404
+    
+    wait = min(max(request.args.get('wait', 0, type=float), 0.0), config.ASYNC_JOB_MAX_WAIT)
+    if wait > 0:
+        job.wait(wait)
+    
+    return jsonify(recognition_job_json(job)), 200 if job.done else 202
+
+
+def recognize_image(image_bytes, timeout=None):
+    """Deteksi + encoding + pencocokan, memakai cache untuk frame yang dikirim ulang"""
+    with metrics.timer('cache_lookup'):
+        cache_key = recognition_cache.key(image_bytes) if recognition_cache.enabled else None
+        result = recognition_cache.get(cache_key, image_bytes)
+    if result is None:
+        generation = face_rec.generation
+        with metrics.timer('inference'):
+            result = recognition_batcher.recognize(image_bytes, timeout)
+        recognition_cache.put(cache_key, result, generation, image_bytes)
+    return result
+
+
+def process_recognition(attendance_type, image_bytes):
+    """Pengenalan wajah dari data JPEG: langsung, atau sebagai job asinkron (HTTP 202)"""
+    if recognition_async_requested():
+        try:
+            job = recognition_jobs.submit(recognize_attendance, attendance_type, image_bytes,
+                                          config.ASYNC_INFERENCE_TIMEOUT)
+        except QueueFullError:
+            return jsonify({'success': False, 'message': 'Server sedang sibuk, silakan coba lagi.'}), 503, {'Retry-After': '5'}
+        poll_url = url_for('absensi_job', job_id=job.id)
+        return jsonify(recognition_job_json(job)), 202, {'Location': poll_url}
+    
+    payload, status = recognize_attendance(attendance_type, image_bytes)
+    headers = {'Retry-After': '5'} if status == 503 else {}
+    return jsonify(payload), status, headers
+
+
+def recognize_attendance(attendance_type, image_bytes, timeout=None):
+    """Pengenalan wajah dan pencatatan absensi dari data JPEG.
+
+    Mengembalikan (payload, status_code) tanpa memakai konteks request Flask,
+    sehingga bisa dijalankan di thread job asinkron.
+    """
+    payload = pipeline_unavailable_payload(timeout=timeout)
+    if payload is not None:
+        return payload, 503
+    
+    try:
+        # Deteksi wajah dan pencocokan (cache frame ulang, batch bersama request lain)
+        face_locations, face_encodings, best = recognize_image(image_bytes, timeout)
         
         if len(face_locations) == 0:
-            return jsonify({'success': False, 'message': 'Tidak ada wajah terdeteksi!'})
-        
-        face_encodings = fr.face_encodings(rgb_image, face_locations)
+            return {'success': False, 'message': 'Tidak ada wajah terdeteksi!'}, 200
         
         if len(face_encodings) == 0:
-            return jsonify({'success': False, 'message': 'Gagal mengenali wajah!'})
+            return {'success': False, 'message': 'Gagal mengenali wajah!'}, 200
         
         face_encoding = face_encodings[0]
         
-        # Cocokkan dengan database
-        matches = fr.compare_faces(face_rec.known_face_encodings, face_encoding, 
-                                   tolerance=config.TOLERANCE)
+        # Hasil pencocokan dengan database
+        if not best or best[0][1] > config.TOLERANCE:
+            return {'success': False, 'message': 'Wajah tidak dikenali! Pastikan Anda sudah terdaftar.'}, 200
         
-        if True not in matches:
-            return jsonify({'success': False, 'message': 'Wajah tidak dikenali! Pastikan Anda sudah terdaftar.'})
-        
-        # Temukan yang paling cocok
-        face_distances = fr.face_distance(face_rec.known_face_encodings, face_encoding)
-        best_match_index = np.argmin(face_distances)
-        min_distance = face_distances[best_match_index]
+        # Kandidat yang paling cocok
+        employee_id, min_distance = best[0]
         
         # Validasi ganda: harus match DAN distance di bawah threshold
-        if matches[best_match_index] and min_distance <= config.MAX_FACE_DISTANCE:
-            employee_id = face_rec.known_face_ids[best_match_index]
-            name = face_rec.known_face_names[best_match_index]
+        if min_distance <= config.MAX_FACE_DISTANCE:
+            name = face_rec.get_name(employee_id)
             confidence = (1 - min_distance) * 100
             
+            # Wajah dengan kecocokan tinggi (tapi tidak identik) disimpan sebagai
+            # template tambahan agar pengenalan berikutnya lebih mudah
+            if (config.TEMPLATE_AUTO_ADD
+                    and config.TEMPLATE_AUTO_ADD_MIN_DISTANCE <= min_distance <= config.TEMPLATE_AUTO_ADD_MAX_DISTANCE):
+                add_face_template(employee_id, face_encoding, 'absensi')
+            
             # Record attendance
-            success, message = db.record_attendance(employee_id, attendance_type)
+            now = datetime.now()
+            with metrics.timer('db_record_attendance'):
+                success, message = attendance_recorder.record_attendance(employee_id, attendance_type, now)
             
             if success:
+                record = dashboard_stats.attendance_recorded(employee_id, name, attendance_type, now)
+                if record is not None:
+                    attendance_events.publish('attendance', {
+                        'record': attendance_record_json(record),
+                        'stats': dashboard_stats.counts()
+                    })
                 action = "Check-in" if attendance_type == 'check_in' else "Check-out"
-                return jsonify({
+                return {
                     'success': True, 
                     'message': f'{action} berhasil! (Confidence: {confidence:.1f}%)',
                     'employee_id': employee_id,
                     'name': name,
                     'confidence': round(confidence, 1)
-                })
+                }, 200
             else:
-                return jsonify({'success': False, 'message': message})
+                return {'success': False, 'message': message}, 200
         else:
-            return jsonify({
+            return {
                 'success': False, 
                 'message': f'Wajah tidak cukup cocok! (Similarity: {(1-min_distance)*100:.1f}%) Threshold minimum: {(1-config.MAX_FACE_DISTANCE)*100:.1f}%'
-            })
+            }, 200
             
+    except QueueFullError:
+        return {'success': False, 'message': 'Server sedang sibuk, silakan coba lagi.'}, 503
+    except InferenceTimeoutError:
+        return {'success': False, 'message': 'Pengenalan wajah terlalu lama, silakan coba lagi.'}, 504
     except Exception as e:
-        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+        return {'success': False, 'message': f'Error: {str(e)}'}, 200
 
 
 @app.route('/pegawai')
@@ -214,12 +531,25 @@ def pegawai():
 @app.route('/pegawai/delete/<employee_id>', methods=['POST'])
 def pegawai_delete(employee_id):
     """Hapus pegawai"""
+    # Galeri harus sudah dimuat supaya pegawai yang dihapus tidak ikut termuat
+    unavailable = pipeline_unavailable('gallery')
+    if unavailable is not None:
+        return unavailable
+    
     try:
+        if attendance_journal is not None:
+            # Event absensi yang masih antri di-commit dulu sebelum ikut dihapus
+            attendance_journal.flush()
         success = db.delete_employee(employee_id)
         if success:
-            # Reload face data
-            face_data = db.get_all_face_encodings()
-            face_rec.load_known_faces(face_data)
+            if attendance_journal is not None:
+                attendance_journal.forget(employee_id)
+            dashboard_stats.employee_deleted(employee_id)
+            attendance_events.publish('stats', {'stats': dashboard_stats.counts(), 'removed': employee_id})
+            # Hapus dari galeri tanpa reload seluruh data
+            face_rec.remove_face(employee_id)
+            if config.EMBEDDING_INDEX_ENABLED:
+                face_rec.set_index_version(db.get_gallery_state()[0])
             
             return jsonify({'success': True, 'message': 'Pegawai berhasil dihapus!'})
         else:
@@ -228,72 +558,197 @@ def pegawai_delete(employee_id):
         return jsonify({'success': False, 'message': f'Error: {str(e)}'})
 
 
+@app.route('/pegawai/<employee_id>/template', methods=['POST'])
+def pegawai_add_template(employee_id):
+    """Menambahkan foto wajah (template) untuk pegawai yang sudah terdaftar"""
+    image_bytes, error = read_image_upload()
+    if error is not None:
+        return error
+    unavailable = pipeline_unavailable()
+    if unavailable is not None:
+        return unavailable
+    
+    try:
+        name = face_rec.get_name(employee_id)
+        if name is None:
+            return jsonify({'success': False, 'message': 'Pegawai tidak ditemukan!'}), 404
+        
+        face_locations, face_encodings, best = recognition_batcher.recognize(image_bytes)
+        if len(face_encodings) == 0:
+            return jsonify({'success': False, 'message': 'Tidak ada wajah terdeteksi!'})
+        
+        # Tolak jika wajah lebih mirip pegawai lain
+        if best and best[0][0] != employee_id and best[0][1] <= config.MAX_FACE_DISTANCE:
+            return jsonify({
+                'success': False,
+                'message': f'Wajah ini lebih mirip pegawai lain: {face_rec.get_name(best[0][0])}!'
+            })
+        
+        # Tolak wajah yang tidak cocok dengan foto pegawai ini (mis. orang yang belum terdaftar)
+        templates, valid = decode_face_encodings(db.get_face_templates(employee_id))
+        templates = templates[valid]
+        if len(templates) == 0:
+            return jsonify({'success': False, 'message': f'Foto wajah {name} tidak ditemukan!'})
+        distance = float(np.linalg.norm(templates - face_encodings[0], axis=1).min())
+        if distance > config.TEMPLATE_UPLOAD_MAX_DISTANCE:
+            return jsonify({'success': False, 'message': f'Wajah tidak cocok dengan foto {name} yang sudah terdaftar!'})
+        
+        if add_face_template(employee_id, face_encodings[0], 'registrasi'):
+            return jsonify({'success': True, 'message': f'Foto wajah {name} berhasil ditambahkan!'})
+        return jsonify({'success': False, 'message': 'Gagal menambahkan foto wajah!'})
+    
+    except QueueFullError:
+        return jsonify({'success': False, 'message': 'Server sedang sibuk, silakan coba lagi.'}), 503
+    except InferenceTimeoutError:
+        return jsonify({'success': False, 'message': 'Pengenalan wajah terlalu lama, silakan coba lagi.'}), 504
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+
 @app.route('/riwayat')
 def riwayat():
-    """Halaman riwayat absensi"""
+    """Halaman riwayat absensi (per halaman)"""
     # Default: tampilkan hari ini
     start_date = request.args.get('start_date', datetime.now().strftime('%Y-%m-%d'))
     end_date = request.args.get('end_date', datetime.now().strftime('%Y-%m-%d'))
+    after = parse_history_key(request.args.get('after'))
     
-    history = db.get_attendance_history(start_date=start_date, end_date=end_date)
+    history, next_key = db.get_attendance_history_page(start_date=start_date, end_date=end_date,
+                                                       limit=config.HISTORY_PAGE_SIZE, after=after)
+    total = db.count_attendance_history(start_date=start_date, end_date=end_date)
     
-    return render_template('riwayat.html', history=history, 
-                          start_date=start_date, end_date=end_date)
+    return render_template('riwayat.html', history=history, total=total,
+                          start_date=start_date, end_date=end_date,
+                          is_first_page=after is None,
+                          next_key=format_history_key(next_key))
 
 
-@app.route('/api/attendance/today')
-def api_attendance_today():
-    """API untuk mendapatkan absensi hari ini"""
-    attendance = db.get_attendance_today()
-    
-    result = []
-    for record in attendance:
-        employee_id, name, check_in, check_out, status = record
-        result.append({
-            'employee_id': employee_id,
-            'name': name,
-            'check_in': check_in,
-            'check_out': check_out,
-            'status': status
-        })
-    
-    return jsonify(result)
-
-
-def generate_frames():
-    """Generator untuk video streaming"""
-    camera = cv2.VideoCapture(config.CAMERA_INDEX)
-    
-    while True:
-        success, frame = camera.read()
-        if not success:
-            break
-        
-        # Flip untuk efek mirror
-        frame = cv2.flip(frame, 1)
-        
-        # Deteksi wajah
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = fr.face_locations(rgb_frame)
-        
-        # Gambar kotak di sekitar wajah
-        for (top, right, bottom, left) in face_locations:
-            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+def format_history_key(key):
+    """Kunci halaman (date, id) ke parameter URL"""
+    if key is None:
+        return None
+    return f"{key[0]}_{key[1]}"
+
+
+def parse_history_key(value):
+    """Parameter URL ke kunci halaman (date, id); None jika kosong/tidak valid"""
+    if not value:
+        return None
+    date, _, row_id = value.rpartition('_')
+    if not date or not row_id.isdigit():
+        return None
+    return date, int(row_id)
+
+
+HISTORY_EXPORT_COLUMNS = ['employee_id', 'name', 'date', 'check_in', 'check_out', 'status']
+
+
+@app.route('/riwayat/export')
+def riwayat_export():
+    """Export riwayat absensi (CSV atau JSON lines) secara streaming"""
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    employee_id = request.args.get('employee_id')
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'jsonl'):
+        return jsonify({'success': False, 'message': 'Format harus csv atau jsonl'}), 400
+    
+    rows = db.iter_attendance_history(employee_id, start_date, end_date,
+                                      page_size=config.EXPORT_PAGE_SIZE)
+    
+    def generate():
+        # Setiap halaman ditulis ke buffer kecil lalu langsung dikirim
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if export_format == 'csv':
+            writer.writerow(HISTORY_EXPORT_COLUMNS)
         
-        # Encode frame
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
+        for count, row in enumerate(rows, 1):
+            if export_format == 'csv':
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(dict(zip(HISTORY_EXPORT_COLUMNS, row))) + '\n')
+            
+            if count % config.EXPORT_PAGE_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
         
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+        yield buffer.getvalue()
+    
+    filename = f"riwayat_{start_date or 'awal'}_{end_date or 'akhir'}.{export_format}"
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+@app.route('/api/attendance/today')
+def api_attendance_today():
+    """API untuk mendapatkan absensi hari ini (304 jika tidak ada perubahan)"""
+    etag = dashboard_stats.etag
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        _, attendance, etag = dashboard_stats.snapshot()
+        response = jsonify([attendance_record_json(record) for record in attendance])
+    
+    # Browser selalu validasi ulang ke server dengan If-None-Match
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def attendance_record_json(record):
+    """Record absensi (tuple) ke dict JSON"""
+    employee_id, name, check_in, check_out, status = record
+    return {
+        'employee_id': employee_id,
+        'name': name,
+        'check_in': check_in,
+        'check_out': check_out,
+        'status': status
+    }
+
+
+@app.route('/api/attendance/stream')
+def api_attendance_stream():
+    """Server-Sent Events: perubahan absensi hari ini dikirim saat terjadi"""
+    subscriber = attendance_events.subscribe()
+    if subscriber is None:
+        return jsonify({'success': False, 'message': 'Terlalu banyak koneksi live update'}), 503
     
-    camera.release()
+    return Response(attendance_events.stream(subscriber), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/recognition/stats')
+def api_recognition_stats():
+    """API statistik micro-batching, cache, dan job asinkron pengenalan wajah"""
+    stats = recognition_batcher.stats()
+    stats['cache'] = recognition_cache.stats()
+    stats['jobs'] = recognition_jobs.stats()
+    return jsonify(stats)
+
+
+@app.route('/api/ready')
+def api_ready():
+    """Readiness: 200 jika galeri dan model pengenalan wajah sudah siap, 503 jika belum"""
+    status = dict(pipeline_warmup.status(),
+                  gallery_size=len(face_rec),
+                  inference_workers=recognition_service.workers)
+    return jsonify(status), 200 if status['ready'] else 503
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Metrik latensi per tahap dan status antrian (format teks Prometheus)"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/video_feed')
 def video_feed():
     """Streaming video dari kamera"""
-    return Response(generate_frames(),
+    return Response(camera_stream.frames(),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
 
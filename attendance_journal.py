@@ -0,0 +1,234 @@
+"""
+Write-behind untuk pencatatan absensi
+Event absensi ditulis ke journal append-only lalu di-commit ke database
+oleh thread background dalam transaksi berkelompok
+"""
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import config
+
+
+class AttendanceJournal:
+    """Pengganti db.record_attendance() yang tidak menunggu commit SQLite.
+
+    Status absensi hari ini (sudah check-in / sudah check-out) disimpan di
+    memori sehingga check-in/check-out ganda tetap ditolak seketika. Event
+    yang diterima ditulis ke file journal dan di-fsync sebelum response
+    dikirim (satu fsync untuk semua request yang menunggu bersamaan); thread
+    writer meng-commit-nya ke tabel attendance per batch, dan journal yang
+    tersisa saat restart diputar ulang. Journal yang melebihi compact_bytes
+    ditulis ulang hanya dengan event yang belum di-commit.
+
+    Cache status hanya valid jika aplikasi berjalan di satu process.
+    """
+
+    def __init__(self, db, path=None, flush_interval_ms=None, batch_size=None, compact_bytes=None):
+        self.db = db
+        self.path = path or config.ATTENDANCE_JOURNAL_PATH
+        if flush_interval_ms is None:
+            flush_interval_ms = config.ATTENDANCE_FLUSH_INTERVAL_MS
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.batch_size = max(1, batch_size or config.ATTENDANCE_FLUSH_BATCH_SIZE)
+        self.compact_bytes = compact_bytes or config.ATTENDANCE_JOURNAL_COMPACT_BYTES
+
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._day = None
+        self._states = {}
+        self._pending = deque()  # (seq, baris journal) yang belum di-commit ke database
+        self._written = 0  # seq terakhir yang ditulis ke journal
+
+        # Group commit fsync: satu request melakukan fsync untuk semua yang menunggu
+        self._sync_cond = threading.Condition()
+        self._syncing = False
+        self._synced = 0  # seq terakhir yang sudah di-fsync
+
+        self.replay()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+        self._thread.start()
+
+    def replay(self):
+        """Meng-commit event journal yang belum masuk database (setelah restart)"""
+        # Sisa compaction yang terputus; journal asli masih utuh
+        if os.path.exists(self.path + '.tmp'):
+            os.remove(self.path + '.tmp')
+        if not os.path.exists(self.path):
+            return
+
+        events = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    events.append(self._parse(line))
+                except (ValueError, KeyError):
+                    # Baris terakhir bisa terpotong jika process mati saat menulis
+                    print(f"Journal absensi: baris rusak dilewati: {line.strip()!r}")
+
+        if events:
+            self.db.apply_attendance_events(events)
+            print(f"Journal absensi: {len(events)} event diputar ulang")
+        os.remove(self.path)
+
+    def record_attendance(self, employee_id, attendance_type='check_in', timestamp=None):
+        """Mencatat absensi; hasil sama dengan DatabaseManager.record_attendance"""
+        now = timestamp or datetime.now()
+
+        with self._lock:
+            states = self._states_for(now.date())
+            state = states.get(employee_id)
+
+            if attendance_type == 'check_in':
+                if state is not None:
+                    return False, "Sudah melakukan check-in hari ini"
+            elif attendance_type == 'check_out':
+                if state is None:
+                    return False, "Belum melakukan check-in"
+                if state == 'check_out':
+                    return False, "Sudah melakukan check-out hari ini"
+            else:
+                return None
+
+            line = json.dumps({
+                'employee_id': employee_id,
+                'type': attendance_type,
+                'time': now.isoformat(),
+            }) + '\n'
+            self._file.write(line)
+            self._file.flush()
+            self._written += 1
+            seq = self._written
+            self._pending.append((seq, line))
+            states[employee_id] = attendance_type
+            self._queue.put((seq, (employee_id, attendance_type, now)))
+
+        # Response baru dikirim setelah event aman di disk
+        self._sync(seq)
+
+        if attendance_type == 'check_in':
+            return True, "Check-in berhasil"
+        return True, "Check-out berhasil"
+
+    def forget(self, employee_id):
+        """Menghapus status absensi pegawai dari cache (pegawai dihapus)"""
+        with self._lock:
+            self._states.pop(employee_id, None)
+
+    def flush(self):
+        """Menunggu sampai semua event yang diterima sudah di-commit"""
+        self._queue.join()
+
+    def _sync(self, seq):
+        """fsync journal sampai seq; request yang datang selama fsync ikut fsync berikutnya"""
+        with self._sync_cond:
+            while self._synced < seq and self._syncing:
+                self._sync_cond.wait()
+            if self._synced >= seq:
+                return
+            self._syncing = True
+
+        synced = None
+        try:
+            with self._lock:
+                target = self._written
+                # dup: file bisa diganti oleh compaction selama fsync berjalan
+                fd = os.dup(self._file.fileno())
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            synced = target
+        finally:
+            with self._sync_cond:
+                self._syncing = False
+                if synced is not None:
+                    self._synced = max(self._synced, synced)
+                self._sync_cond.notify_all()
+
+    def _states_for(self, day):
+        # Ganti hari: status dimuat ulang dari database
+        if day != self._day:
+            self._states = self.db.get_attendance_states(day)
+            self._day = day
+        return self._states
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._commit(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _commit(self, batch):
+        """Commit satu batch; diulang sampai berhasil (event tetap aman di journal)"""
+        events = [event for _, event in batch]
+        while True:
+            try:
+                self.db.apply_attendance_events(events)
+                break
+            except Exception as e:
+                print(f"Error writing attendance batch: {e}")
+                time.sleep(1.0)
+
+        committed = batch[-1][0]
+        with self._lock:
+            while self._pending and self._pending[0][0] <= committed:
+                self._pending.popleft()
+
+            if not self._pending:
+                # Semua event di journal sudah ter-commit: journal dikosongkan
+                self._file.seek(0)
+                self._file.truncate()
+            elif self._file.tell() >= self.compact_bytes:
+                self._compact()
+
+    def _compact(self):
+        """Menulis ulang journal hanya dengan event yang belum di-commit. Dipanggil dengan _lock terkunci."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(line for _, line in self._pending)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        _fsync_directory(os.path.dirname(os.path.abspath(self.path)))
+
+        self._file.close()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        # Semua baris yang sudah ditulis kini ada di file baru yang sudah di-fsync
+        with self._sync_cond:
+            self._synced = max(self._synced, self._written)
+            self._sync_cond.notify_all()
+
+    @staticmethod
+    def _parse(line):
+        record = json.loads(line)
+        return (record['employee_id'], record['type'], datetime.fromisoformat(record['time']))
+
+
+def _fsync_directory(path):
+    """fsync direktori agar rename journal tahan crash (tidak didukung di Windows)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,120 @@
+"""
+Benchmark penulisan absensi (check-in) di bawah beban pembaca bersamaan
+
+Membandingkan DatabaseManager (pool koneksi + WAL) dengan pola lama
+(koneksi baru per operasi, journal rollback). Database dibuat di folder
+sementara, absensi.db tidak disentuh.
+
+Contoh:
+    python benchmarks/bench_database.py --employees 5000 --writers 4 --readers 8
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from database import DatabaseManager  # noqa: E402
+
+
+class LegacyDatabaseManager(DatabaseManager):
+    """Pola lama: koneksi baru untuk setiap operasi, journal_mode=DELETE"""
+
+    def __init__(self):
+        self.db_path = config.DATABASE_PATH
+        self.init_database()
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=config.DATABASE_BUSY_TIMEOUT,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        return conn
+
+    def connection(self):
+        return _ClosingConnection(self.get_connection())
+
+
+class _ClosingConnection:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+        self.conn.close()
+
+
+def run(manager_class, db_path, employees, writers, readers):
+    config.DATABASE_PATH = db_path
+    db = manager_class()
+    with db.connection() as conn:
+        conn.executemany(
+            "INSERT INTO employees (employee_id, name) VALUES (?, ?)",
+            [(f"B{i:06d}", f"Pegawai {i}") for i in range(employees)])
+
+    stop = threading.Event()
+    reads = [0] * readers
+    errors = []
+
+    def reader(slot):
+        while not stop.is_set():
+            db.get_attendance_today()
+            reads[slot] += 1
+
+    def writer(ids):
+        for employee_id in ids:
+            try:
+                db.record_attendance(employee_id, 'check_in')
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+    ids = [f"B{i:06d}" for i in range(employees)]
+    reader_threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    writer_threads = [threading.Thread(target=writer, args=(ids[i::writers],)) for i in range(writers)]
+
+    for t in reader_threads:
+        t.start()
+    start = time.perf_counter()
+    for t in writer_threads:
+        t.start()
+    for t in writer_threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for t in reader_threads:
+        t.join()
+
+    return {
+        'writes_per_sec': employees / elapsed,
+        'reads_per_sec': sum(reads) / elapsed,
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--employees', type=int, default=2000, help="jumlah check-in yang ditulis")
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, manager_class in (('legacy', LegacyDatabaseManager), ('pool+wal', DatabaseManager)):
+            result = run(manager_class, os.path.join(tmp, f"{label.replace('+', '_')}.db"),
+                         args.employees, args.writers, args.readers)
+            print(f"{label:10s} check-in/detik: {result['writes_per_sec']:8.1f}  "
+                  f"baca/detik: {result['reads_per_sec']:8.1f}  error: {result['errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,369 @@
+"""
+Benchmark pipeline deteksi, encoding, pencocokan galeri, dan database
+
+Berjalan offline tanpa kamera: foto di employee_images/ dipakai untuk
+deteksi + encoding pada beberapa resolusi, galeri sintetis (embedding acak
+128-d) untuk pencocokan dan startup, dan database sementara berisi jutaan
+baris absensi. Hasil ditulis ke JSON supaya dua run bisa dibandingkan.
+absensi.db tidak disentuh.
+
+Contoh:
+    python benchmarks/bench_suite.py --output hasil.json
+    python benchmarks/bench_suite.py --only matching,startup --gallery-sizes 1000,10000
+    python benchmarks/bench_suite.py --only detection --model cnn --upsample 0 --output cnn.json
+    python benchmarks/bench_suite.py --compare hasil.json cnn.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+
+SECTIONS = ('detection', 'matching', 'startup', 'database')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+QUERY_NOISE_STD = 0.03  # Noise query sintetis (wajah yang sama, foto berbeda)
+
+
+def measure(func, repeat=5, number=1):
+    """Menjalankan func repeat x number kali; statistik durasi per panggilan (ms)"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) * 1000.0 / number)
+    samples.sort()
+    return {
+        'mean_ms': round(float(np.mean(samples)), 4),
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples, 95)), 4),
+        'min_ms': round(samples[0], 4),
+        'samples': len(samples),
+    }
+
+
+def result(name, stats, extra=None, **params):
+    """Satu baris hasil; params = identitas benchmark (kunci --compare), extra = nilai terukur lain"""
+    stats = dict(stats, **(extra or {}))
+    print(f"  {name:28s} {json.dumps(params, sort_keys=True):64s} {stats['mean_ms']:10.3f} ms"
+          + (f"  {json.dumps(extra, sort_keys=True)}" if extra else ''))
+    return {'name': name, 'params': params, 'stats': stats}
+
+
+def synthetic_gallery(size, seed=0):
+    """Embedding acak dengan sebaran mirip encoding dlib (norm ~1)"""
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0.0, 1.0 / np.sqrt(128), size=(size, 128)).astype(np.float32)
+    employee_ids = [f"S{i:07d}" for i in range(size)]
+    names = [f"Pegawai {i}" for i in range(size)]
+    return employee_ids, names, encodings
+
+
+def synthetic_queries(encodings, count, seed=1):
+    """Query = baris galeri acak + noise; jawaban benar diketahui"""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(encodings), size=count)
+    queries = encodings[rows] + rng.normal(0.0, QUERY_NOISE_STD, size=(count, 128)).astype(np.float32)
+    return rows, queries
+
+
+def bench_detection(args):
+    """face_locations dan face_encodings pada foto employee_images/ di beberapa resolusi"""
+    import cv2
+    import face_recognition
+    from face_detection import detect_and_encode_faces
+
+    model = args.model or config.FACE_DETECTION_MODEL
+    upsample = config.NUMBER_OF_TIMES_TO_UPSAMPLE if args.upsample is None else args.upsample
+    paths = sorted(os.path.join(args.images, f) for f in os.listdir(args.images)
+                   if f.lower().endswith(IMAGE_EXTENSIONS))[:args.max_images]
+    if not paths:
+        print(f"  Tidak ada foto di {args.images}, bagian detection dilewati")
+        return []
+
+    images = [face_recognition.load_image_file(path) for path in paths]
+    results = []
+    for short_side in args.resolutions:
+        scaled = []
+        for image in images:
+            scale = min(1.0, short_side / min(image.shape[:2])) if short_side else 1.0
+            scaled.append(cv2.resize(image, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                          if scale < 1.0 else image)
+
+        locations = [face_recognition.face_locations(image, number_of_times_to_upsample=upsample, model=model)
+                     for image in scaled]
+        faces = sum(len(found) for found in locations)
+        label = short_side or 'original'
+
+        stats = measure(lambda: [face_recognition.face_locations(
+            image, number_of_times_to_upsample=upsample, model=model) for image in scaled], args.repeat)
+        stats = _per_item(stats, len(scaled))
+        results.append(result('face_locations', stats, {'faces_found': faces}, short_side=label,
+                              model=model, upsample=upsample, images=len(scaled)))
+
+        with_faces = [(image, found) for image, found in zip(scaled, locations) if found]
+        if with_faces:
+            stats = measure(lambda: [face_recognition.face_encodings(image, found)
+                                     for image, found in with_faces], args.repeat)
+            stats = _per_item(stats, len(with_faces))
+            results.append(result('face_encodings', stats, short_side=label, images=len(with_faces)))
+
+    # Pipeline aplikasi: deteksi di salinan kecil, encoding di resolusi asli
+    stats = measure(lambda: [detect_and_encode_faces(image, still_image=True) for image in images], args.repeat)
+    stats = _per_item(stats, len(images))
+    results.append(result('detect_and_encode_faces', stats, detection_short_side=config.DETECTION_SHORT_SIDE,
+                          model=config.FACE_DETECTION_MODEL, images=len(images)))
+    return results
+
+
+def _per_item(stats, count):
+    """Mengubah statistik per batch menjadi per gambar"""
+    count = max(count, 1)
+    return {key: round(value / count, 4) if key.endswith('_ms') else value for key, value in stats.items()}
+
+
+def bench_matching(args):
+    """match() / match_batch() pada galeri sintetis, exact vs IVF"""
+    from face_recognition_module import FaceRecognitionModule
+    from encoding_format import encode_face_encoding
+
+    matching_mode, min_gallery_size = config.MATCHING_MODE, config.ANN_MIN_GALLERY_SIZE
+    results = []
+    for size in args.gallery_sizes:
+        employee_ids, names, encodings = synthetic_gallery(size, args.seed)
+        face_data = list(zip(employee_ids, names, map(encode_face_encoding, encodings)))
+        rows, queries = synthetic_queries(encodings, args.queries, args.seed + 1)
+
+        for mode in ('exact', 'ivf'):
+            config.MATCHING_MODE = mode
+            config.ANN_MIN_GALLERY_SIZE = 0
+            gallery = FaceRecognitionModule(capacity=size)
+            started = time.perf_counter()
+            gallery.load_known_faces(face_data)
+            build_ms = (time.perf_counter() - started) * 1000.0
+
+            query_iter = iter(np.tile(queries, (args.repeat * 2 + 1, 1)))
+            stats = measure(lambda: gallery.match(next(query_iter), k=1), args.repeat, len(queries))
+            accuracy = np.mean([gallery.match(query, k=1)[0][0] == employee_ids[row]
+                                for row, query in zip(rows, queries)])
+            results.append(result('match', stats, {'accuracy': round(float(accuracy), 4),
+                                                   'build_ms': round(build_ms, 2)},
+                                  gallery_size=size, mode=mode))
+
+            batch = queries[:args.batch_size]
+            stats = _per_item(measure(lambda: gallery.match_batch(batch, k=1), args.repeat), len(batch))
+            results.append(result('match_batch', stats, gallery_size=size, mode=mode, batch_size=len(batch)))
+
+    config.MATCHING_MODE, config.ANN_MIN_GALLERY_SIZE = matching_mode, min_gallery_size
+    return results
+
+
+def bench_startup(args):
+    """load_known_faces dari BLOB database dan attach index memmap"""
+    from face_recognition_module import FaceRecognitionModule
+    from encoding_format import encode_face_encoding
+    from embedding_index import EmbeddingIndex
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.gallery_sizes:
+            employee_ids, names, encodings = synthetic_gallery(size, args.seed)
+            face_data = list(zip(employee_ids, names, map(encode_face_encoding, encodings)))
+
+            stats = measure(lambda: FaceRecognitionModule().load_known_faces(face_data), args.repeat)
+            results.append(result('load_known_faces', stats, gallery_size=size))
+
+            path = os.path.join(tmp, f"bench_{size}.idx")
+            EmbeddingIndex.build(path, employee_ids, names, encodings, 1)
+            stats = measure(lambda: FaceRecognitionModule().attach_index(EmbeddingIndex.open(path)), args.repeat)
+            results.append(result('attach_index', stats, gallery_size=size))
+    return results
+
+
+def bench_database(args):
+    """record_attendance dan query riwayat pada tabel absensi berisi jutaan baris"""
+    from database import DatabaseManager
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DATABASE_PATH = os.path.join(tmp, "bench.db")
+        db = DatabaseManager()
+
+        employees = args.db_employees
+        days = max(1, -(-args.db_rows // employees))
+        employee_ids = [f"B{i:06d}" for i in range(employees)]
+        started = time.perf_counter()
+        _fill_attendance(db, employee_ids, days, args.db_rows)
+        fill_s = time.perf_counter() - started
+        print(f"  {args.db_rows} baris absensi ({employees} pegawai x {days} hari) dibuat dalam {fill_s:.1f} detik")
+
+        params = {'rows': args.db_rows, 'employees': employees}
+        first_day = date.today() - timedelta(days=days)
+
+        # Hari ini belum ada absensi: check-in lalu check-out untuk sampel pegawai
+        sample = random.Random(args.seed).sample(employee_ids, min(args.db_ops, employees))
+        now = datetime.now()
+        check_in = iter(sample)
+        stats = measure(lambda: db.record_attendance(next(check_in), 'check_in', now), 1, len(sample))
+        results.append(result('record_attendance_check_in', stats, **params))
+        check_out = iter(sample)
+        stats = measure(lambda: db.record_attendance(next(check_out), 'check_out', now), 1, len(sample))
+        results.append(result('record_attendance_check_out', stats, **params))
+        duplicate = iter(sample)
+        stats = measure(lambda: db.record_attendance(next(duplicate), 'check_in', now), 1, len(sample))
+        results.append(result('record_attendance_duplicate', stats, **params))
+
+        employee_id = sample[0]
+        stats = measure(lambda: db.get_attendance_history(employee_id=employee_id), args.repeat)
+        results.append(result('history_one_employee', stats, **params))
+
+        week_start = (date.today() - timedelta(days=7)).isoformat()
+        stats = measure(lambda: db.get_attendance_history_page(start_date=week_start,
+                                                               limit=config.HISTORY_PAGE_SIZE), args.repeat)
+        results.append(result('history_page_first', stats, **params))
+
+        # Halaman jauh di belakang (keyset, tidak memakai OFFSET)
+        deep_key = (first_day + timedelta(days=days // 2)).isoformat(), 1 << 62
+        stats = measure(lambda: db.get_attendance_history_page(limit=config.HISTORY_PAGE_SIZE, after=deep_key),
+                        args.repeat)
+        results.append(result('history_page_deep', stats, **params))
+
+        stats = measure(lambda: db.count_attendance_history(start_date=week_start), args.repeat)
+        results.append(result('history_count_week', stats, **params))
+
+        stats = measure(lambda: db.get_attendance_today(), args.repeat)
+        results.append(result('attendance_today', stats, **params))
+        db.close()
+    return results
+
+
+def _fill_attendance(db, employee_ids, days, rows):
+    """Mengisi pegawai dan absensi historis langsung dengan executemany (satu transaksi)"""
+    first_day = date.today() - timedelta(days=days)
+
+    def attendance_rows():
+        written = 0
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            check_in = datetime.combine(day, datetime.min.time()) + timedelta(hours=8)
+            check_out = check_in + timedelta(hours=9)
+            for employee_id in employee_ids[:rows - written]:
+                yield employee_id, str(check_in), str(check_out), day.isoformat()
+            written += min(len(employee_ids), rows - written)
+
+    with db.connection() as conn:
+        # Data benchmark boleh hilang jika crash: tanpa fsync supaya pengisian cepat
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executemany("INSERT INTO employees (employee_id, name) VALUES (?, ?)",
+                         [(employee_id, f"Pegawai {employee_id}") for employee_id in employee_ids])
+        conn.executemany("INSERT INTO attendance (employee_id, check_in_time, check_out_time, date) "
+                         "VALUES (?, ?, ?, ?)", attendance_rows())
+        conn.commit()
+        conn.execute(f"PRAGMA synchronous={config.DATABASE_SYNCHRONOUS}")
+        conn.execute("ANALYZE")
+        # Checkpoint sekarang supaya tidak terjadi di tengah pengukuran
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def environment(args):
+    """Informasi mesin dan konfigurasi yang mempengaruhi hasil"""
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {
+            'TOLERANCE': config.TOLERANCE,
+            'MAX_FACE_DISTANCE': config.MAX_FACE_DISTANCE,
+            'FACE_DETECTION_MODEL': config.FACE_DETECTION_MODEL,
+            'NUMBER_OF_TIMES_TO_UPSAMPLE': config.NUMBER_OF_TIMES_TO_UPSAMPLE,
+            'DETECTION_SHORT_SIDE': config.DETECTION_SHORT_SIDE,
+            'IVF_NLIST': config.IVF_NLIST,
+            'IVF_NPROBE': config.IVF_NPROBE,
+            'ANN_TARGET_RECALL': config.ANN_TARGET_RECALL,
+        },
+        'args': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+    }
+
+
+def compare(old_path, new_path):
+    """Membandingkan dua file hasil: rasio mean_ms baru / lama per benchmark"""
+    def load(path):
+        with open(path) as f:
+            data = json.load(f)
+        return {(r['name'], json.dumps(r['params'], sort_keys=True)): r['stats']['mean_ms']
+                for r in data['results']}
+
+    old, new = load(old_path), load(new_path)
+    print(f"{'benchmark':28s} {'params':64s} {'lama':>10s} {'baru':>10s} {'rasio':>7s}")
+    for key in sorted(old.keys() & new.keys()):
+        name, params = key
+        ratio = new[key] / old[key] if old[key] else float('inf')
+        print(f"{name:28s} {params:64s} {old[key]:10.3f} {new[key]:10.3f} {ratio:6.2f}x")
+    for key in sorted(old.keys() ^ new.keys()):
+        print(f"{key[0]:28s} {key[1]:64s} hanya ada di {'lama' if key in old else 'baru'}")
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', default=','.join(SECTIONS), help=f"bagian yang dijalankan ({','.join(SECTIONS)})")
+    parser.add_argument('--output', help="file JSON hasil benchmark")
+    parser.add_argument('--compare', nargs=2, metavar=('LAMA', 'BARU'), help="bandingkan dua file hasil")
+    parser.add_argument('--repeat', type=int, default=5, help="pengulangan per pengukuran")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--images', default=config.EMPLOYEE_IMAGES_DIR, help="folder foto untuk detection")
+    parser.add_argument('--max-images', type=int, default=20)
+    parser.add_argument('--resolutions', type=int_list, default=[240, 480, 720, 0],
+                        help="sisi pendek gambar untuk detection (0 = resolusi asli)")
+    parser.add_argument('--model', choices=('hog', 'cnn'), help="model deteksi (default config)")
+    parser.add_argument('--upsample', type=int, help="number_of_times_to_upsample (default config)")
+    parser.add_argument('--gallery-sizes', type=int_list, default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=200, help="jumlah query match() per galeri")
+    parser.add_argument('--batch-size', type=int, default=8, help="ukuran batch match_batch()")
+    parser.add_argument('--db-rows', type=int, default=2000000, help="jumlah baris absensi historis")
+    parser.add_argument('--db-employees', type=int, default=5000)
+    parser.add_argument('--db-ops', type=int, default=500, help="jumlah record_attendance yang diukur")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    benches = {'detection': bench_detection, 'matching': bench_matching,
+               'startup': bench_startup, 'database': bench_database}
+    sections = [section for section in args.only.split(',') if section]
+    unknown = [section for section in sections if section not in benches]
+    if unknown:
+        parser.error(f"bagian tidak dikenal: {', '.join(unknown)}")
+
+    report = {'environment': environment(args), 'results': []}
+    for section in sections:
+        print(f"[{section}]")
+        try:
+            report['results'].extend(dict(r, section=section) for r in benches[section](args))
+        except ImportError as e:
+            print(f"  Dilewati, dependency tidak tersedia: {e}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Hasil disimpan ke {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+Import pegawai massal dari folder foto (config.EMPLOYEE_IMAGES_DIR)
+
+Nama file: <ID>_<Nama_Pegawai>.jpg, misalnya EM001_Rivaldi.jpg.
+Encoding wajah dihitung paralel di semua core, foto yang isinya sudah pernah
+didaftarkan dilewati, pengecekan wajah ganda dilakukan dengan satu perhitungan
+matriks, lalu semua pegawai baru disimpan dalam satu transaksi.
+
+Contoh:
+    python bulk_enroll.py
+    python bulk_enroll.py --dir foto_pegawai --workers 4 --dry-run
+"""
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import face_recognition
+import numpy as np
+import config
+from database import DatabaseManager
+from encoding_format import EMBEDDING_DIM, encode_face_encoding
+from face_detection import detect_and_encode_faces
+from face_recognition_module import FaceRecognitionModule
+from inference_worker import init_worker
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def parse_filename(filename):
+    """EM001_Muhammad_Rivaldi.jpg -> ('EM001', 'Muhammad Rivaldi'); None jika tidak sesuai"""
+    stem, ext = os.path.splitext(filename)
+    if ext.lower() not in IMAGE_EXTENSIONS:
+        return None
+    employee_id, _, name = stem.partition('_')
+    if not employee_id or not name:
+        return None
+    return employee_id, name.replace('_', ' ')
+
+
+def encode_image(path):
+    """Dijalankan di worker: (encoding, None) atau (None, alasan gagal)"""
+    try:
+        image = face_recognition.load_image_file(path)
+        face_locations, face_encodings = detect_and_encode_faces(image, still_image=True)
+    except Exception as e:
+        return None, f"gagal dibaca: {e}"
+    if len(face_encodings) == 0:
+        return None, "tidak ada wajah terdeteksi"
+    if len(face_encodings) > 1:
+        return None, f"terdeteksi {len(face_encodings)} wajah"
+    return np.asarray(face_encodings[0], dtype=np.float32), None
+
+
+def scan_images(directory, known_ids, known_hashes):
+    """Daftar kandidat (employee_id, name, path, image_hash) yang perlu di-encode"""
+    candidates = []
+    seen_ids = set()
+    for filename in sorted(os.listdir(directory)):
+        parsed = parse_filename(filename)
+        if parsed is None:
+            continue
+        employee_id, name = parsed
+        path = os.path.join(directory, filename)
+
+        with open(path, 'rb') as f:
+            image_hash = hashlib.sha256(f.read()).hexdigest()
+        if image_hash in known_hashes:
+            continue
+        if employee_id in known_ids or employee_id in seen_ids:
+            print(f"  Lewati {filename}: ID {employee_id} sudah terdaftar")
+            continue
+
+        known_hashes.add(image_hash)
+        seen_ids.add(employee_id)
+        candidates.append((employee_id, name, path, image_hash))
+    return candidates
+
+
+def find_duplicates(encodings, filenames, gallery, max_distance):
+    """Indeks encoding baru yang wajahnya sudah ada di galeri atau di batch sebelumnya.
+
+    Mengembalikan dict {indeks: keterangan}.
+    """
+    duplicates = {}
+    if len(encodings) == 0:
+        return duplicates
+
+    # Terhadap pegawai yang sudah terdaftar: satu perkalian matriks-matriks
+    for i, best in enumerate(gallery.match_batch(encodings, k=1)):
+        if best and best[0][1] <= max_distance:
+            duplicates[i] = f"wajah sudah terdaftar atas nama {gallery.get_name(best[0][0])}"
+
+    # Antar foto dalam batch: jarak berpasangan, dibandingkan dengan foto sebelumnya saja
+    sq_norms = np.einsum('ij,ij->i', encodings, encodings)
+    sq_distances = sq_norms[:, None] + sq_norms[None, :] - 2.0 * (encodings @ encodings.T)
+    close = np.triu(sq_distances <= max_distance ** 2, k=1)
+    for j in np.flatnonzero(close.any(axis=0)):
+        if j not in duplicates:
+            i = int(np.flatnonzero(close[:, j])[0])
+            duplicates[int(j)] = f"wajah sama dengan {filenames[i]}"
+    return duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import pegawai massal dari folder foto")
+    parser.add_argument('--dir', default=config.EMPLOYEE_IMAGES_DIR, help="folder foto pegawai")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="jumlah worker process untuk encoding")
+    parser.add_argument('--dry-run', action='store_true', help="hanya tampilkan hasil, tanpa menyimpan")
+    args = parser.parse_args()
+
+    db = DatabaseManager()
+    started = time.perf_counter()
+    candidates = scan_images(args.dir, db.get_employee_ids(), db.get_image_hashes())
+    print(f"{len(candidates)} foto baru ditemukan di {args.dir}")
+    if not candidates:
+        return
+
+    # Encoding paralel; setiap worker memuat model dlib sekali di initializer
+    paths = [path for _, _, path, _ in candidates]
+    encode_started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), initializer=init_worker) as pool:
+        chunksize = max(1, len(paths) // (max(1, args.workers) * 4))
+        results = list(pool.map(encode_image, paths, chunksize=chunksize))
+    encode_elapsed = time.perf_counter() - encode_started
+
+    encoded = []
+    for candidate, (encoding, error) in zip(candidates, results):
+        if error is not None:
+            print(f"  Lewati {os.path.basename(candidate[2])}: {error}")
+        else:
+            encoded.append((candidate, encoding))
+
+    encodings = np.array([encoding for _, encoding in encoded], dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    # Mode 'min': setiap template tambahan ikut dibandingkan sebagai baris sendiri
+    gallery = FaceRecognitionModule(template_matching='min')
+    gallery.load_known_faces(db.get_all_face_encodings(), db.get_all_face_templates())
+    filenames = [os.path.basename(candidate[2]) for candidate, _ in encoded]
+    duplicates = find_duplicates(encodings, filenames, gallery, config.MAX_FACE_DISTANCE)
+
+    employees = []
+    for i, ((employee_id, name, path, image_hash), encoding) in enumerate(encoded):
+        if i in duplicates:
+            print(f"  Lewati {filenames[i]}: {duplicates[i]}")
+            continue
+        employees.append((employee_id, name, None, None, path,
+                          encode_face_encoding(encoding), image_hash))
+
+    if args.dry_run:
+        added = 0
+        print(f"Dry run: {len(employees)} pegawai akan ditambahkan")
+    else:
+        added = db.add_employees(employees)
+    elapsed = time.perf_counter() - started
+
+    print(f"Encoding: {len(paths)} foto dalam {encode_elapsed:.2f} detik "
+          f"({len(paths) / encode_elapsed:.1f} foto/detik, {args.workers} worker)")
+    print(f"Selesai: {added} pegawai ditambahkan dalam {elapsed:.2f} detik "
+          f"({len(paths) / elapsed:.1f} foto/detik)")
+    if added:
+        print("Restart aplikasi agar pegawai baru dimuat ke galeri wajah")
+
+
+if __name__ == '__main__':
+    main()
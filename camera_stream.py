@@ -0,0 +1,167 @@
+"""
+Satu thread kamera untuk semua client streaming video (MJPEG)
+Frame terbaru disimpan di memori, deteksi wajah berjalan di thread terpisah
+dengan rate terbatas, dan JPEG hanya di-encode sekali per frame
+(cv2 / face_recognition baru diimpor saat client pertama terhubung)
+"""
+import threading
+import time
+import config
+from metrics import metrics
+
+
+class CameraStream:
+    """Pemilik tunggal cv2.VideoCapture yang dibagi ke banyak client.
+
+    Thread capture hanya menyimpan frame terbaru; client yang lambat
+    melewatkan frame, bukan menumpuknya. Kamera dibuka saat client pertama
+    terhubung dan dilepas setelah idle_timeout detik tanpa client.
+    """
+
+    def __init__(self, camera_index=None, detection_fps=None, max_client_fps=None,
+                 jpeg_quality=None, idle_timeout=None):
+        self.camera_index = config.CAMERA_INDEX if camera_index is None else camera_index
+        self.detection_fps = detection_fps or config.STREAM_DETECTION_FPS
+        self.max_client_fps = max_client_fps or config.STREAM_MAX_FPS
+        self.jpeg_quality = jpeg_quality or config.STREAM_JPEG_QUALITY
+        self.idle_timeout = config.CAMERA_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._running = False
+        self._generation = 0
+        self._clients = 0
+        self._idle_since = None
+
+        self._face_locations = []
+
+        self._encode_lock = threading.Lock()
+        self._jpeg = None
+        self._jpeg_seq = -1
+
+    @property
+    def client_count(self):
+        return self._clients
+
+    def _start(self):
+        # Dipanggil dengan _cond terkunci
+        if self._running:
+            return
+        self._running = True
+        self._generation += 1
+        self._frame = None
+        self._face_locations = []
+        threading.Thread(target=self._capture_loop, name="camera-capture", daemon=True).start()
+        threading.Thread(target=self._detection_loop, args=(self._generation,),
+                         name="camera-detection", daemon=True).start()
+
+    def _capture_loop(self):
+        import cv2
+
+        idle = False
+        camera = cv2.VideoCapture(self.camera_index)
+        camera.set(cv2.CAP_PROP_FRAME_WIDTH, config.CAMERA_WIDTH)
+        camera.set(cv2.CAP_PROP_FRAME_HEIGHT, config.CAMERA_HEIGHT)
+        try:
+            while True:
+                success, frame = camera.read()
+                with self._cond:
+                    if not success:
+                        print("Error: gagal membaca frame kamera")
+                        break
+                    if self._clients == 0 and time.monotonic() - self._idle_since >= self.idle_timeout:
+                        idle = True
+                        break
+
+                    # Flip untuk efek mirror
+                    self._frame = cv2.flip(frame, 1)
+                    self._seq += 1
+                    self._cond.notify_all()
+        finally:
+            camera.release()
+            with self._cond:
+                self._running = False
+                # Client baru datang saat kamera sedang dilepas: buka lagi
+                if idle and self._clients > 0:
+                    self._start()
+                self._cond.notify_all()
+
+    def _detection_loop(self, generation):
+        import cv2
+        from face_detection import detect_faces
+
+        interval = 1.0 / self.detection_fps
+        last_seq = 0
+        while True:
+            started = time.monotonic()
+            with self._cond:
+                if not self._running or self._generation != generation:
+                    break
+                frame, seq = self._frame, self._seq
+
+            if frame is not None and seq != last_seq:
+                try:
+                    with metrics.timer('stream_detect'):
+                        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                        self._face_locations = detect_faces(rgb_frame)
+                except Exception as e:
+                    print(f"Error detecting faces in stream: {e}")
+                last_seq = seq
+
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def wait_jpeg(self, after_seq, timeout=5.0):
+        """Menunggu frame yang lebih baru dari after_seq; mengembalikan (seq, jpeg).
+
+        Mengembalikan (after_seq, None) jika kamera berhenti atau timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._running and (self._frame is None or self._seq == after_seq):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return after_seq, None
+                self._cond.wait(remaining)
+            if self._frame is None or self._seq == after_seq:
+                return after_seq, None
+            frame, seq = self._frame, self._seq
+
+        import cv2
+
+        # Client pertama yang meminta frame ini meng-encode, yang lain memakai hasilnya
+        with self._encode_lock:
+            if self._jpeg_seq < seq:
+                with metrics.timer('stream_jpeg_encode'):
+                    frame = frame.copy()
+                    for (top, right, bottom, left) in self._face_locations:
+                        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+                    ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                if ret:
+                    self._jpeg, self._jpeg_seq = buffer.tobytes(), seq
+            return self._jpeg_seq, self._jpeg
+
+    def frames(self):
+        """Generator multipart MJPEG untuk satu client, dibatasi max_client_fps"""
+        with self._cond:
+            self._clients += 1
+            self._start()
+
+        interval = 1.0 / self.max_client_fps
+        last_seq = 0
+        try:
+            while True:
+                started = time.monotonic()
+                last_seq, jpeg = self.wait_jpeg(last_seq)
+                if jpeg is None:
+                    break
+
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+        finally:
+            with self._cond:
+                self._clients -= 1
+                if self._clients == 0:
+                    self._idle_since = time.monotonic()
@@ -13,20 +13,117 @@ ATTENDANCE_LOGS_DIR = os.path.join(BASE_DIR, "attendance_logs")
 os.makedirs(EMPLOYEE_IMAGES_DIR, exist_ok=True)
 os.makedirs(ATTENDANCE_LOGS_DIR, exist_ok=True)
 
+# Pengaturan Database (SQLite)
+DATABASE_POOL_SIZE = 8  # Jumlah koneksi menganggur yang disimpan untuk dipakai ulang
+DATABASE_BUSY_TIMEOUT = 5.0  # Detik menunggu lock sebelum error "database is locked"
+DATABASE_SYNCHRONOUS = 'NORMAL'  # NORMAL aman untuk WAL dan jauh lebih cepat dari FULL
+DATABASE_CACHE_SIZE_KB = 16384  # Ukuran page cache per koneksi
+
+# Write-behind absensi: event dicatat ke journal lalu di-commit ke database di background
+ATTENDANCE_WRITE_BEHIND = False  # True = response tidak menunggu commit SQLite
+ATTENDANCE_JOURNAL_PATH = os.path.join(ATTENDANCE_LOGS_DIR, "attendance.journal")
+ATTENDANCE_FLUSH_INTERVAL_MS = 200  # Waktu maksimum event menunggu sebelum di-commit
+ATTENDANCE_FLUSH_BATCH_SIZE = 256  # Maksimum event per transaksi
+ATTENDANCE_JOURNAL_COMPACT_BYTES = 1024 * 1024  # Journal sebesar ini ditulis ulang tanpa event yang sudah di-commit
+
+# Live update dashboard (Server-Sent Events)
+SSE_MAX_CLIENTS = 500  # Maksimum dashboard yang terhubung bersamaan
+SSE_CLIENT_QUEUE_SIZE = 64  # Buffer event per client; client yang lebih lambat diputus
+SSE_KEEPALIVE_SECONDS = 15  # Interval komentar keepalive
+
+# Riwayat absensi
+HISTORY_PAGE_SIZE = 100  # Jumlah record per halaman di /riwayat
+EXPORT_PAGE_SIZE = 1000  # Jumlah record yang dibaca per query saat export
+
 # Pengaturan Face Recognition
 FACE_DETECTION_CONFIDENCE = 0.5  # Threshold untuk deteksi wajah
 TOLERANCE = 0.4  # Semakin kecil, semakin ketat (0.4 = ketat, 0.6 = longgar)
 MAX_FACE_DISTANCE = 0.45  # Maximum distance untuk dianggap match (lebih ketat dari TOLERANCE)
 
+# Strategi pencocokan galeri
+MATCHING_MODE = 'exact'  # 'exact' = scan seluruh galeri, 'ivf' = approximate (galeri sangat besar)
+ANN_MIN_GALLERY_SIZE = 20000  # Di bawah ukuran ini tetap memakai scan exact
+IVF_NLIST = 0  # Jumlah cluster IVF, 0 = otomatis (~akar N)
+IVF_NPROBE = 8  # Jumlah cluster yang dipindai per query (lebih besar = recall lebih tinggi)
+ANN_TARGET_RECALL = 0.99  # nprobe dinaikkan otomatis sampai recall ini tercapai (0 = nonaktif)
+
+# Beberapa template wajah per pegawai
+MAX_TEMPLATES_PER_EMPLOYEE = 5  # Termasuk foto registrasi (1 = hanya foto registrasi)
+TEMPLATE_MATCHING = 'min'  # 'min' = jarak terkecil dari semua template, 'centroid' = rata-rata template
+TEMPLATE_UPLOAD_MAX_DISTANCE = 0.5  # Foto tambahan harus sedekat ini dengan salah satu foto pegawai tersebut
+TEMPLATE_AUTO_ADD = False  # Simpan wajah hasil absensi yang sangat cocok sebagai template baru
+TEMPLATE_AUTO_ADD_MAX_DISTANCE = 0.35  # Hanya jika jarak di bawah ini (kecocokan tinggi)
+TEMPLATE_AUTO_ADD_MIN_DISTANCE = 0.1  # dan di atas ini (bukan duplikat template yang ada)
+
 # Pengaturan untuk deteksi berkualitas tinggi
 FACE_DETECTION_MODEL = 'hog'  # 'hog' lebih cepat, 'cnn' lebih akurat
+FACE_DETECTION_FALLBACK_MODEL = None  # 'cnn' = ulangi dengan CNN jika model utama tidak menemukan wajah (hanya foto upload)
 NUMBER_OF_TIMES_TO_UPSAMPLE = 1  # Meningkatkan deteksi wajah kecil
+DETECTION_SHORT_SIDE = 240  # Deteksi dijalankan pada salinan dengan sisi pendek ini (0 = resolusi asli)
+DETECTION_RETRY_FULL_RES = True  # Ulangi deteksi di resolusi asli jika wajah tidak ditemukan (hanya foto upload, bukan frame video)
+
+# Index embedding di disk (np.memmap) untuk startup cepat & berbagi antar worker
+EMBEDDING_INDEX_ENABLED = False
+EMBEDDING_INDEX_PATH = os.path.join(BASE_DIR, "embeddings.idx")
+
+# Pool worker inferensi (deteksi + encoding wajah)
+INFERENCE_WORKERS = None  # None = jumlah core CPU, 0 = jalankan langsung di thread request
+INFERENCE_QUEUE_SIZE = 32  # Maksimum job menunggu/berjalan, selebihnya ditolak (HTTP 503)
+INFERENCE_TIMEOUT = 15  # Batas waktu per job (detik)
+INFERENCE_START_METHOD = 'spawn'  # Cara membuat worker: 'spawn' (process bersih, semua platform), 'forkserver' (POSIX)
+
+# Startup: galeri dan model dlib dimuat di background thread
+WARMUP_MODE = 'background'  # 'background' = halaman ringan langsung dilayani, 'blocking' = tunggu sampai siap
+WARMUP_WAIT_TIMEOUT = 10  # Detik request pengenalan menunggu warm-up sebelum dijawab 503
+
+# Micro-batching request recognize yang datang bersamaan
+BATCH_MAX_SIZE = 8  # Maksimum request per batch (1 = tanpa batching)
+BATCH_MAX_WAIT_MS = 5  # Waktu tunggu maksimum untuk mengumpulkan batch (milidetik)
+
+# Cache hasil pengenalan untuk frame yang dikirim ulang dari kiosk
+RECOGNITION_CACHE_SIZE = 256  # Maksimum entry (0 = nonaktif)
+RECOGNITION_CACHE_TTL = 10  # Umur entry (detik)
+RECOGNITION_CACHE_KEY = 'exact'  # 'exact' = byte identik, 'perceptual' = frame hampir sama dengan area wajah yang sama
+RECOGNITION_CACHE_MAX_HAMMING = 6  # Maksimum bit dHash frame (dari 256) yang boleh berbeda
+RECOGNITION_CACHE_MAX_FACE_HAMMING = 24  # Maksimum bit dHash area wajah yang boleh berbeda (wajah lain ~110+)
+
+# Profil cProfile untuk request lambat (aktifkan dengan env ABSENSI_PROFILE=1)
+PROFILE_SLOW_REQUESTS = os.environ.get('ABSENSI_PROFILE', '') == '1'
+PROFILE_SLOW_REQUEST_MS = int(os.environ.get('ABSENSI_PROFILE_SLOW_MS', '500'))  # Hanya request selambat ini yang disimpan
+PROFILE_DIR = os.path.join(ATTENDANCE_LOGS_DIR, "profiles")
+
+# Pengenalan asinkron (job ID + polling), untuk deteksi lambat seperti CNN di CPU
+RECOGNITION_ASYNC = False  # True = /absensi/recognize mengembalikan job ID (per request: async=1 / async=0)
+ASYNC_JOB_WORKERS = 8  # Thread yang menjalankan job (sebagian besar menunggu worker inferensi)
+ASYNC_MAX_PENDING_JOBS = None  # Maksimum job yang belum selesai (gambar disimpan di memori), None = INFERENCE_QUEUE_SIZE
+ASYNC_JOB_TTL = 300  # Detik hasil job disimpan setelah selesai
+ASYNC_JOB_MAX_WAIT = 30  # Batas long-polling per request (detik)
+ASYNC_INFERENCE_TIMEOUT = 120  # Batas waktu inferensi untuk job asinkron (detik)
+
+# Batas ukuran upload gambar JPEG mentah (byte)
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
 
 # Pengaturan Kamera
 CAMERA_INDEX = 0
 CAMERA_WIDTH = 640
 CAMERA_HEIGHT = 480
 
+# Pelacakan wajah pada pengenalan real-time (recognize_face_from_camera)
+FACE_TRACKING_ENABLED = True  # False = deteksi + encoding setiap frame kedua
+TRACK_REDETECT_INTERVAL = 15  # Deteksi penuh setiap sekian frame (menangkap wajah baru)
+TRACK_IDLE_DETECT_INTERVAL = 2  # Interval deteksi selama belum ada wajah di frame
+TRACK_REIDENTIFY_INTERVAL = 90  # Encoding + pencocokan ulang track setiap sekian frame
+TRACK_MIN_QUALITY = 7.0  # Skor tracker dlib di bawah ini = track hilang, deteksi ulang
+TRACK_VOTE_WINDOW = 10  # Jumlah observasi (jarak + embedding) terakhir yang disimpan per track
+TRACK_VOTE_AGREE = 3  # Identitas diterima setelah sekian frame setuju (atau embedding rata-rata cocok)
+TRACK_VOTE_INTERVAL = 3  # Jarak frame antar observasi selama identitas belum dikonfirmasi
+
+# Streaming video (/video_feed) dari satu thread kamera untuk semua client
+STREAM_MAX_FPS = 15  # Batas frame per detik per client
+STREAM_DETECTION_FPS = 5  # Frekuensi deteksi wajah untuk kotak di video
+STREAM_JPEG_QUALITY = 80  # Kualitas JPEG (0-100)
+CAMERA_IDLE_TIMEOUT = 5  # Kamera dilepas setelah sekian detik tanpa client
+
 # Pengaturan Aplikasi
 APP_TITLE = "Sistem Absensi Face Recognition"
 APP_WIDTH = 1000
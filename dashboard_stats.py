@@ -0,0 +1,115 @@
+"""
+Cache statistik dashboard di memori
+Diperbarui langsung dari event absensi / registrasi / hapus pegawai,
+sehingga dashboard dan API polling tidak perlu query database
+"""
+import secrets
+import threading
+from datetime import datetime
+
+
+def _format_time(value):
+    """Format timestamp sama seperti yang disimpan SQLite (str(datetime))"""
+    return str(value) if value is not None else None
+
+
+class DashboardStats:
+    """Jumlah pegawai dan daftar absensi hari ini.
+
+    Setiap perubahan menaikkan version; etag dibentuk dari nonce acak per
+    instance (version dimulai ulang dari 0 setiap process), tanggal, dan
+    version sehingga client yang datanya masih sama cukup dijawab 304.
+    Data dimuat ulang dari database saat pertama dipakai dan saat ganti hari.
+    Hanya valid jika aplikasi berjalan di satu process.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._day = None
+        self._employee_count = 0
+        self._records = {}
+        self._version = 0
+        self._nonce = secrets.token_hex(4)
+        self._sorted = None
+
+    def _current(self):
+        """Memuat ulang dari database jika ganti hari; True jika baru dimuat.
+        Dipanggil dengan _lock terkunci."""
+        today = datetime.now().date()
+        if today == self._day:
+            return False
+        self._employee_count = self.db.count_employees()
+        self._records = {record[0]: list(record) for record in self.db.get_attendance_today()}
+        self._day = today
+        self._changed()
+        return True
+
+    def _changed(self):
+        self._version += 1
+        self._sorted = None
+
+    def _etag(self):
+        return f"{self._nonce}-{self._day.isoformat()}-{self._version}"
+
+    @property
+    def etag(self):
+        with self._lock:
+            self._current()
+            return self._etag()
+
+    def snapshot(self):
+        """Mengembalikan (stats, attendance_today, etag)"""
+        with self._lock:
+            self._current()
+            if self._sorted is None:
+                # Urutan sama dengan get_attendance_today(): check-in terbaru dulu
+                self._sorted = sorted((tuple(record) for record in self._records.values()),
+                                      key=lambda record: record[2] or '', reverse=True)
+            return self._counts(), self._sorted, self._etag()
+
+    def counts(self):
+        """Jumlah pegawai, hadir, dan belum absen hari ini"""
+        with self._lock:
+            self._current()
+            return self._counts()
+
+    def _counts(self):
+        present_today = len(self._records)
+        return {
+            'total_employees': self._employee_count,
+            'present_today': present_today,
+            'absent_today': self._employee_count - present_today,
+        }
+
+    def attendance_recorded(self, employee_id, name, attendance_type, timestamp):
+        """Dipanggil setelah record_attendance berhasil; mengembalikan record terbaru"""
+        with self._lock:
+            self._current()
+            if timestamp.date() != self._day:
+                return None
+            if attendance_type == 'check_in':
+                self._records[employee_id] = [employee_id, name, _format_time(timestamp), None, 'Hadir']
+            elif employee_id in self._records:
+                self._records[employee_id][3] = _format_time(timestamp)
+            else:
+                return None
+            self._changed()
+            return tuple(self._records[employee_id])
+
+    def employee_added(self, employee_id):
+        """Dipanggil setelah add_employee berhasil"""
+        with self._lock:
+            # Jika baru dimuat, pegawai baru sudah ikut terhitung dari database
+            if not self._current():
+                self._employee_count += 1
+                self._changed()
+
+    def employee_deleted(self, employee_id):
+        """Dipanggil setelah delete_employee berhasil (absensinya ikut terhapus)"""
+        with self._lock:
+            self._current()
+            # delete_employee juga "berhasil" untuk ID yang tidak ada, jadi dihitung ulang
+            self._employee_count = self.db.count_employees()
+            self._records.pop(employee_id, None)
+            self._changed()
@@ -2,23 +2,145 @@
 Modul Database untuk Sistem Absensi Face Recognition
 Mengelola data pegawai dan catatan absensi
 """
+import queue
 import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
 import config
+from encoding_format import encode_face_encoding, is_encoded_blob, load_legacy_encoding
+from metrics import metrics
+
+# Versi skema database (disimpan di PRAGMA user_version)
+# 1: face_encoding disimpan dalam format biner float32 (bukan pickle)
+# 2: index unik attendance(employee_id, date) dan index attendance(date)
+# 3: kolom employees.image_hash (hash isi foto registrasi)
+SCHEMA_VERSION = 3
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor yang mencatat durasi eksekusi SQL dan fetch (stage db_query)"""
+    
+    def execute(self, *args):
+        with metrics.timer('db_query'):
+            return super().execute(*args)
+    
+    def executemany(self, *args):
+        with metrics.timer('db_query'):
+            return super().executemany(*args)
+    
+    def executescript(self, *args):
+        with metrics.timer('db_query'):
+            return super().executescript(*args)
+    
+    def fetchone(self):
+        with metrics.timer('db_query'):
+            return super().fetchone()
+    
+    def fetchmany(self, *args, **kwargs):
+        with metrics.timer('db_query'):
+            return super().fetchmany(*args, **kwargs)
+    
+    def fetchall(self):
+        with metrics.timer('db_query'):
+            return super().fetchall()
+
+
+class TimedConnection(sqlite3.Connection):
+    """Koneksi dengan TimedCursor dan durasi commit (stage db_commit).
+    
+    Yang diukur hanya kerja SQLite, bukan lamanya koneksi dipinjam (mis.
+    selama export CSV mengalirkan data ke client).
+    """
+    
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+    
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+    
+    def commit(self):
+        with metrics.timer('db_commit'):
+            super().commit()
+
+
+class ConnectionPool:
+    """Pool koneksi SQLite yang aman dipakai banyak thread.
+    
+    Koneksi dipinjam untuk satu operasi lalu dikembalikan, sehingga dipakai
+    ulang antar request (beserta cache prepared statement milik sqlite3).
+    Koneksi tidak pernah dipakai dua thread secara bersamaan.
+    """
+    
+    def __init__(self, factory, size):
+        self._factory = factory
+        self._idle = queue.LifoQueue(maxsize=size)
+    
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._factory()
+    
+    def release(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+    
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
 
 class DatabaseManager:
     def __init__(self):
         self.db_path = config.DATABASE_PATH
+        self.pool = ConnectionPool(self.get_connection, config.DATABASE_POOL_SIZE)
         self.init_database()
     
     def get_connection(self):
-        """Membuat koneksi ke database"""
-        return sqlite3.connect(self.db_path)
+        """Membuat koneksi baru ke database (WAL, pragma untuk performa)"""
+        conn = sqlite3.connect(self.db_path, timeout=config.DATABASE_BUSY_TIMEOUT,
+                               check_same_thread=False, cached_statements=256, factory=TimedConnection)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={config.DATABASE_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size=-{config.DATABASE_CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        """Meminjam koneksi dari pool; commit jika sukses, rollback jika error"""
+        conn = self.pool.acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.release(conn)
+    
+    def close(self):
+        """Menutup semua koneksi yang menganggur di pool"""
+        self.pool.close_all()
     
     def init_database(self):
         """Inisialisasi tabel database"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            self._create_tables(conn.cursor())
+        
+        self.migrate_database()
+    
+    def _create_tables(self, cursor):
+        """Membuat tabel dan trigger jika belum ada"""
         
         # Tabel Pegawai
         cursor.execute("""
@@ -47,143 +169,376 @@ class DatabaseManager:
             )
         """)
         
-        conn.commit()
-        conn.close()
+        # Versi galeri wajah, dinaikkan otomatis oleh trigger setiap kali
+        # data wajah pegawai berubah (dipakai untuk cek konsistensi index embedding)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS gallery_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO gallery_state (id, version) VALUES (1, 0)")
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS employees_gallery_insert AFTER INSERT ON employees
+            BEGIN
+                UPDATE gallery_state SET version = version + 1 WHERE id = 1;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS employees_gallery_update
+            AFTER UPDATE OF employee_id, name, face_encoding ON employees
+            BEGIN
+                UPDATE gallery_state SET version = version + 1 WHERE id = 1;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS employees_gallery_delete AFTER DELETE ON employees
+            BEGIN
+                UPDATE gallery_state SET version = version + 1 WHERE id = 1;
+            END
+        """)
+        
+        # Template wajah tambahan per pegawai (selain encoding saat registrasi)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS employee_templates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                employee_id TEXT NOT NULL,
+                face_encoding BLOB NOT NULL,
+                source TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (employee_id) REFERENCES employees (employee_id)
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_employee_templates_employee
+            ON employee_templates (employee_id)
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS employee_templates_gallery_insert AFTER INSERT ON employee_templates
+            BEGIN
+                UPDATE gallery_state SET version = version + 1 WHERE id = 1;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS employee_templates_gallery_delete AFTER DELETE ON employee_templates
+            BEGIN
+                UPDATE gallery_state SET version = version + 1 WHERE id = 1;
+            END
+        """)
     
-    def add_employee(self, employee_id, name, department, position, image_path, face_encoding):
-        """Menambahkan pegawai baru"""
-        try:
-            conn = self.get_connection()
+    def migrate_database(self):
+        """Menjalankan migrasi skema satu kali berdasarkan PRAGMA user_version"""
+        with self.connection() as conn:
             cursor = conn.cursor()
             
-            cursor.execute("""
-                INSERT INTO employees (employee_id, name, department, position, image_path, face_encoding)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (employee_id, name, department, position, image_path, face_encoding))
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
             
-            conn.commit()
-            conn.close()
+            if version < 1:
+                self._migrate_face_encodings(cursor)
+            
+            if version < 2:
+                self._migrate_attendance_indexes(cursor)
+            
+            if version < 3:
+                self._migrate_image_hash(cursor)
+            
+            if version < SCHEMA_VERSION:
+                cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    
+    def _migrate_face_encodings(self, cursor):
+        """Mengubah BLOB face encoding lama (pickle) ke format biner float32"""
+        cursor.execute("SELECT id, name, face_encoding FROM employees WHERE face_encoding IS NOT NULL")
+        converted = []
+        for row_id, name, blob in cursor.fetchall():
+            if is_encoded_blob(blob):
+                continue
+            try:
+                converted.append((encode_face_encoding(load_legacy_encoding(blob)), row_id))
+            except Exception as e:
+                print(f"Error migrating face encoding for {name}: {e}")
+        
+        cursor.executemany("UPDATE employees SET face_encoding = ? WHERE id = ?", converted)
+        if converted:
+            print(f"Migrasi face encoding: {len(converted)} data diubah ke format biner")
+    
+    def _migrate_attendance_indexes(self, cursor):
+        """Menambahkan index absensi; record ganda per pegawai per hari dibuang dulu"""
+        cursor.execute("""
+            DELETE FROM attendance
+            WHERE id NOT IN (SELECT MIN(id) FROM attendance GROUP BY employee_id, date)
+        """)
+        if cursor.rowcount > 0:
+            print(f"Migrasi absensi: {cursor.rowcount} record ganda dihapus")
+        
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_employee_date
+            ON attendance (employee_id, date)
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance (date)")
+    
+    def _migrate_image_hash(self, cursor):
+        """Menambahkan kolom hash foto registrasi (untuk melewati foto yang sama saat import)"""
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(employees)")]
+        if 'image_hash' not in columns:
+            cursor.execute("ALTER TABLE employees ADD COLUMN image_hash TEXT")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_employees_image_hash ON employees (image_hash)")
+    
+    def add_employee(self, employee_id, name, department, position, image_path, face_encoding,
+                     image_hash=None):
+        """Menambahkan pegawai baru"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("""
+                    INSERT INTO employees (employee_id, name, department, position, image_path,
+                                           face_encoding, image_hash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (employee_id, name, department, position, image_path, face_encoding, image_hash))
             return True
         except sqlite3.IntegrityError:
             return False
     
+    def add_employees(self, employees):
+        """Menambahkan banyak pegawai dalam satu transaksi.
+        
+        employees berisi tuple (employee_id, name, department, position,
+        image_path, face_encoding, image_hash). ID yang sudah ada dilewati.
+        Mengembalikan jumlah pegawai yang benar-benar ditambahkan.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.executemany("""
+                INSERT INTO employees (employee_id, name, department, position, image_path,
+                                       face_encoding, image_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (employee_id) DO NOTHING
+            """, employees)
+            return cursor.rowcount
+    
+    def get_image_hashes(self):
+        """Mendapatkan hash semua foto registrasi yang sudah tersimpan"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT image_hash FROM employees WHERE image_hash IS NOT NULL")
+            return {row[0] for row in cursor.fetchall()}
+    
+    def get_employee_ids(self):
+        """Mendapatkan semua ID pegawai"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT employee_id FROM employees")
+            return {row[0] for row in cursor.fetchall()}
+    
     def get_all_employees(self):
         """Mendapatkan semua data pegawai"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT employee_id, name, department, position FROM employees")
-        employees = cursor.fetchall()
-        
-        conn.close()
-        return employees
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT employee_id, name, department, position FROM employees")
+            return cursor.fetchall()
+    
+    def count_employees(self):
+        """Mendapatkan jumlah pegawai"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT COUNT(*) FROM employees")
+            return cursor.fetchone()[0]
     
     def get_employee(self, employee_id):
         """Mendapatkan data pegawai berdasarkan ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM employees WHERE employee_id = ?", (employee_id,))
-        employee = cursor.fetchone()
-        
-        conn.close()
-        return employee
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT * FROM employees WHERE employee_id = ?", (employee_id,))
+            return cursor.fetchone()
     
     def get_all_face_encodings(self):
         """Mendapatkan semua face encoding untuk pengenalan wajah"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT employee_id, name, face_encoding FROM employees")
+            return cursor.fetchall()
+    
+    def get_all_face_templates(self):
+        """Mendapatkan semua template wajah tambahan (employee_id, name, face_encoding)"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT t.employee_id, e.name, t.face_encoding
+                FROM employee_templates t
+                JOIN employees e ON t.employee_id = e.employee_id
+                ORDER BY t.employee_id, t.id
+            """)
+            return cursor.fetchall()
+    
+    def get_face_templates(self, employee_id):
+        """Mendapatkan semua encoding satu pegawai: encoding registrasi lalu template tambahan"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT face_encoding FROM employees
+                WHERE employee_id = ? AND face_encoding IS NOT NULL
+            """, (employee_id,))
+            blobs = [row[0] for row in cursor.fetchall()]
+            cursor.execute("""
+                SELECT face_encoding FROM employee_templates WHERE employee_id = ? ORDER BY id
+            """, (employee_id,))
+            blobs.extend(row[0] for row in cursor.fetchall())
+            return blobs
+    
+    def add_face_template(self, employee_id, face_encoding, source=None, max_templates=None):
+        """Menambahkan template wajah; template tertua dibuang jika melebihi batas.
         
-        cursor.execute("SELECT employee_id, name, face_encoding FROM employees")
-        data = cursor.fetchall()
+        max_templates menghitung encoding registrasi, jadi template tambahan
+        paling banyak max_templates - 1. Mengembalikan False jika pegawai tidak ada.
+        """
+        if max_templates is None:
+            max_templates = config.MAX_TEMPLATES_PER_EMPLOYEE
+        if max_templates <= 1:
+            return False
         
-        conn.close()
-        return data
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO employee_templates (employee_id, face_encoding, source)
+                SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM employees WHERE employee_id = ?)
+            """, (employee_id, face_encoding, source, employee_id))
+            if cursor.rowcount != 1:
+                return False
+            
+            cursor.execute("""
+                DELETE FROM employee_templates
+                WHERE employee_id = ? AND id NOT IN (
+                    SELECT id FROM employee_templates WHERE employee_id = ?
+                    ORDER BY id DESC LIMIT ?
+                )
+            """, (employee_id, employee_id, max_templates - 1))
+            return True
     
-    def record_attendance(self, employee_id, attendance_type='check_in'):
-        """Mencatat absensi pegawai"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        today = datetime.now().date()
-        now = datetime.now()
+    def get_gallery_state(self, include_templates=False):
+        """Mendapatkan (versi galeri, jumlah baris galeri).
         
-        # Cek apakah sudah ada record hari ini
-        cursor.execute("""
-            SELECT id, check_in_time, check_out_time FROM attendance 
-            WHERE employee_id = ? AND date = ?
-        """, (employee_id, today))
+        Jumlah baris = pegawai yang punya face encoding, ditambah template
+        tambahan jika include_templates (galeri mode 'min').
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT (SELECT version FROM gallery_state WHERE id = 1),
+                       (SELECT COUNT(*) FROM employees WHERE face_encoding IS NOT NULL)
+            """)
+            version, count = cursor.fetchone()
+            if include_templates:
+                cursor.execute("""
+                    SELECT COUNT(*) FROM employee_templates t
+                    JOIN employees e ON t.employee_id = e.employee_id
+                    WHERE e.face_encoding IS NOT NULL
+                """)
+                count += cursor.fetchone()[0]
+            return version, count
+    
+    def record_attendance(self, employee_id, attendance_type='check_in', timestamp=None):
+        """Mencatat absensi pegawai.
         
-        existing = cursor.fetchone()
+        Check-in dan check-out masing-masing satu statement kondisional yang
+        atomik (dijamin index unik employee_id + date), sehingga request
+        bersamaan tidak bisa menghasilkan check-in ganda.
+        """
+        timestamp = timestamp or datetime.now()
         
-        if attendance_type == 'check_in':
-            if existing:
-                # Sudah check-in hari ini
-                conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            if attendance_type == 'check_in':
+                if self._write_attendance(cursor, employee_id, attendance_type, timestamp):
+                    return True, "Check-in berhasil"
                 return False, "Sudah melakukan check-in hari ini"
-            else:
-                # Insert check-in baru
+            
+            elif attendance_type == 'check_out':
+                if self._write_attendance(cursor, employee_id, attendance_type, timestamp):
+                    return True, "Check-out berhasil"
+                
                 cursor.execute("""
-                    INSERT INTO attendance (employee_id, check_in_time, date)
-                    VALUES (?, ?, ?)
-                """, (employee_id, now, today))
-                conn.commit()
-                conn.close()
-                return True, "Check-in berhasil"
-        
-        elif attendance_type == 'check_out':
-            if existing:
-                if existing[2]:  # Sudah check-out
-                    conn.close()
+                    SELECT 1 FROM attendance WHERE employee_id = ? AND date = ?
+                """, (employee_id, timestamp.date()))
+                if cursor.fetchone():
                     return False, "Sudah melakukan check-out hari ini"
-                else:
-                    # Update check-out
-                    cursor.execute("""
-                        UPDATE attendance 
-                        SET check_out_time = ?
-                        WHERE id = ?
-                    """, (now, existing[0]))
-                    conn.commit()
-                    conn.close()
-                    return True, "Check-out berhasil"
-            else:
-                conn.close()
                 return False, "Belum melakukan check-in"
     
-    def get_attendance_today(self):
-        """Mendapatkan semua absensi hari ini"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        today = datetime.now().date()
-        
-        cursor.execute("""
-            SELECT e.employee_id, e.name, a.check_in_time, a.check_out_time, a.status
-            FROM attendance a
-            JOIN employees e ON a.employee_id = e.employee_id
-            WHERE a.date = ?
-            ORDER BY a.check_in_time DESC
-        """, (today,))
-        
-        attendance = cursor.fetchall()
-        conn.close()
-        return attendance
+    def _write_attendance(self, cursor, employee_id, attendance_type, timestamp):
+        """Menulis satu event absensi; True jika record bertambah/berubah"""
+        if attendance_type == 'check_in':
+            # Insert check-in baru; diabaikan jika sudah ada record hari itu
+            cursor.execute("""
+                INSERT INTO attendance (employee_id, check_in_time, date)
+                VALUES (?, ?, ?)
+                ON CONFLICT (employee_id, date) DO NOTHING
+            """, (employee_id, timestamp, timestamp.date()))
+        else:
+            # Update check-out hanya jika sudah check-in dan belum check-out
+            cursor.execute("""
+                UPDATE attendance 
+                SET check_out_time = ?
+                WHERE employee_id = ? AND date = ? AND check_out_time IS NULL
+            """, (timestamp, employee_id, timestamp.date()))
+        return cursor.rowcount == 1
     
-    def get_attendance_history(self, employee_id=None, start_date=None, end_date=None):
-        """Mendapatkan riwayat absensi"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def apply_attendance_events(self, events):
+        """Menulis banyak event (employee_id, attendance_type, timestamp) dalam satu transaksi.
         
-        query = """
-            SELECT e.employee_id, e.name, a.date, a.check_in_time, a.check_out_time, a.status
-            FROM attendance a
-            JOIN employees e ON a.employee_id = e.employee_id
-            WHERE 1=1
+        Idempoten: event yang sudah pernah ditulis tidak mengubah data lagi,
+        sehingga journal aman diputar ulang.
         """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            for employee_id, attendance_type, timestamp in events:
+                self._write_attendance(cursor, employee_id, attendance_type, timestamp)
+    
+    def get_attendance_states(self, date):
+        """Mendapatkan {employee_id: 'check_in' / 'check_out'} untuk satu tanggal"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT employee_id, check_out_time FROM attendance WHERE date = ?
+            """, (date,))
+            return {employee_id: 'check_out' if check_out_time else 'check_in'
+                    for employee_id, check_out_time in cursor.fetchall()}
+    
+    def get_attendance_today(self):
+        """Mendapatkan semua absensi hari ini"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            
+            today = datetime.now().date()
+            
+            cursor.execute("""
+                SELECT e.employee_id, e.name, a.check_in_time, a.check_out_time, a.status
+                FROM attendance a
+                JOIN employees e ON a.employee_id = e.employee_id
+                WHERE a.date = ?
+                ORDER BY a.check_in_time DESC
+            """, (today,))
+            
+            return cursor.fetchall()
+    
+    def _history_filters(self, employee_id=None, start_date=None, end_date=None):
+        """Klausa WHERE dan parameter untuk query riwayat absensi"""
+        query = " WHERE 1=1"
         params = []
         
         if employee_id:
-            query += " AND e.employee_id = ?"
+            query += " AND a.employee_id = ?"
             params.append(employee_id)
         
         if start_date:
@@ -194,25 +549,88 @@ class DatabaseManager:
             query += " AND a.date <= ?"
             params.append(end_date)
         
-        query += " ORDER BY a.date DESC, a.check_in_time DESC"
+        return query, params
+    
+    def get_attendance_history(self, employee_id=None, start_date=None, end_date=None):
+        """Mendapatkan riwayat absensi"""
+        where, params = self._history_filters(employee_id, start_date, end_date)
+        query = """
+            SELECT e.employee_id, e.name, a.date, a.check_in_time, a.check_out_time, a.status
+            FROM attendance a
+            JOIN employees e ON a.employee_id = e.employee_id
+        """ + where + " ORDER BY a.date DESC, a.check_in_time DESC"
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    
+    def count_attendance_history(self, employee_id=None, start_date=None, end_date=None):
+        """Menghitung jumlah record riwayat absensi"""
+        where, params = self._history_filters(employee_id, start_date, end_date)
+        query = """
+            SELECT COUNT(*)
+            FROM attendance a
+            JOIN employees e ON a.employee_id = e.employee_id
+        """ + where
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchone()[0]
+    
+    def get_attendance_history_page(self, employee_id=None, start_date=None, end_date=None,
+                                    limit=100, after=None):
+        """Satu halaman riwayat absensi dengan keyset pagination.
+        
+        Urutan: tanggal terbaru dulu, lalu record terbaru (id) dulu. after adalah
+        kunci (date, id) record terakhir halaman sebelumnya, sehingga halaman
+        berikutnya langsung dicari lewat index tanpa OFFSET.
+        Mengembalikan (rows, next_key); next_key None jika sudah halaman terakhir.
+        """
+        where, params = self._history_filters(employee_id, start_date, end_date)
+        if after is not None:
+            where += " AND (a.date, a.id) < (?, ?)"
+            params.extend(after)
+        query = """
+            SELECT e.employee_id, e.name, a.date, a.check_in_time, a.check_out_time, a.status, a.id
+            FROM attendance a
+            JOIN employees e ON a.employee_id = e.employee_id
+        """ + where + " ORDER BY a.date DESC, a.id DESC LIMIT ?"
+        params.append(limit)
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
         
-        cursor.execute(query, params)
-        history = cursor.fetchall()
+        next_key = (rows[-1][2], rows[-1][6]) if len(rows) == limit else None
+        return [row[:6] for row in rows], next_key
+    
+    def iter_attendance_history(self, employee_id=None, start_date=None, end_date=None,
+                                page_size=1000):
+        """Generator semua record riwayat absensi, dibaca per halaman.
         
-        conn.close()
-        return history
+        Paling banyak satu halaman yang ada di memori, dan koneksi hanya
+        dipinjam selama satu query halaman.
+        """
+        after = None
+        while True:
+            rows, after = self.get_attendance_history_page(employee_id, start_date, end_date,
+                                                           page_size, after)
+            yield from rows
+            if after is None:
+                break
     
     def delete_employee(self, employee_id):
         """Menghapus pegawai"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("DELETE FROM employees WHERE employee_id = ?", (employee_id,))
-            cursor.execute("DELETE FROM attendance WHERE employee_id = ?", (employee_id,))
-            
-            conn.commit()
-            conn.close()
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("DELETE FROM employees WHERE employee_id = ?", (employee_id,))
+                cursor.execute("DELETE FROM attendance WHERE employee_id = ?", (employee_id,))
+                cursor.execute("DELETE FROM employee_templates WHERE employee_id = ?", (employee_id,))
             return True
         except Exception as e:
             print(f"Error deleting employee: {e}")
@@ -0,0 +1,235 @@
+"""
+Index embedding wajah di disk yang dibuka dengan np.memmap
+Beberapa worker process dapat berbagi satu salinan data lewat page cache
+"""
+import os
+import time
+from contextlib import contextmanager
+import numpy as np
+from encoding_format import EMBEDDING_DIM
+
+INDEX_MAGIC = b'FEIX'
+INDEX_VERSION = 2  # v2: kolom primary di tabel id/nama
+
+# Header berukuran tetap 64 byte supaya matriks float32 di belakangnya rata (aligned).
+# 'generation' naik setiap kali isi index diubah, agar process lain tahu harus membaca ulang.
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype({
+    'names': ['magic', 'version', 'dim', 'capacity', 'count',
+              'id_width', 'name_width', 'db_version', 'superseded', 'generation'],
+    'formats': ['S4', '<u2', '<u2', '<u4', '<u4', '<u4', '<u4', '<u8', '<u4', '<u8'],
+    'offsets': [0, 4, 6, 8, 12, 16, 20, 24, 32, 40],
+    'itemsize': HEADER_SIZE,
+})
+
+MIN_ID_WIDTH = 32
+MIN_NAME_WIDTH = 64
+
+
+def _table_dtype(id_width, name_width):
+    # primary = 1 untuk baris encoding registrasi, 0 untuk baris template tambahan
+    return np.dtype([('employee_id', f'S{id_width}'), ('name', f'S{name_width}'), ('primary', 'u1')])
+
+
+def _encode_text(value):
+    return str(value).encode('utf-8')
+
+
+def _decode_column(values):
+    """Decode satu kolom bytes lebar tetap menjadi array object berisi str"""
+    values = np.ascontiguousarray(values)
+    if not values.size or np.frombuffer(values.tobytes(), dtype=np.uint8).max() < 0x80:
+        # Semua ASCII: cast langsung ke unicode jauh lebih cepat dari decode per nilai
+        return values.astype(str).astype(object)
+    return np.char.decode(values, 'utf-8').astype(object)
+
+
+@contextmanager
+def index_lock(path):
+    """Lock eksklusif antar process untuk mengubah index di path.
+
+    Memakai file <path>.lock terpisah sehingga lock tetap berlaku saat file
+    index diganti (os.replace) oleh process yang memegang lock.
+    """
+    with open(path + '.lock', 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK menyerah setelah ~10 detik; terus tunggu
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class EmbeddingIndex:
+    """File index embedding: header tetap, matriks (kapasitas, 128) float32,
+    norm kuadrat per baris, dan tabel id/nama dengan lebar tetap."""
+
+    def __init__(self, path, mmap):
+        self.path = path
+        self._mmap = mmap
+        self.header = mmap[:HEADER_SIZE].view(HEADER_DTYPE)[0:1]
+
+        capacity = self.capacity
+        offset = HEADER_SIZE
+        size = capacity * EMBEDDING_DIM * 4
+        self.encodings = mmap[offset:offset + size].view(np.float32).reshape(capacity, EMBEDDING_DIM)
+        offset += size
+
+        size = capacity * 4
+        self.sq_norms = mmap[offset:offset + size].view(np.float32)
+        offset += size
+
+        table_dtype = _table_dtype(int(self.header['id_width'][0]), int(self.header['name_width'][0]))
+        size = capacity * table_dtype.itemsize
+        self.table = mmap[offset:offset + size].view(table_dtype)
+
+    @property
+    def capacity(self):
+        return int(self.header['capacity'][0])
+
+    @property
+    def count(self):
+        return int(self.header['count'][0])
+
+    @property
+    def db_version(self):
+        return int(self.header['db_version'][0])
+
+    @property
+    def superseded(self):
+        return bool(self.header['superseded'][0])
+
+    @property
+    def generation(self):
+        return int(self.header['generation'][0])
+
+    def set_state(self, count, db_version=None):
+        """Memperbarui jumlah baris (dan versi DB) di header; menaikkan generation"""
+        self.header['count'] = count
+        if db_version is not None:
+            self.header['db_version'] = db_version
+        self.header['generation'] += 1
+
+    def mark_superseded(self):
+        """Menandai file ini sudah diganti, agar process lain membuka ulang path"""
+        self.header['superseded'] = 1
+        self.flush()
+
+    def fits(self, employee_id, name):
+        """Cek apakah id dan nama muat di lebar tabel"""
+        table_dtype = self.table.dtype
+        return (len(_encode_text(employee_id)) <= table_dtype['employee_id'].itemsize
+                and len(_encode_text(name)) <= table_dtype['name'].itemsize)
+
+    def write_row(self, row, employee_id, name, primary=True):
+        self.table[row] = (_encode_text(employee_id), _encode_text(name), primary)
+
+    def read_ids_names(self):
+        """Decode tabel id/nama untuk baris yang terisi (array object)"""
+        rows = self.table[:self.count]
+        return _decode_column(rows['employee_id']), _decode_column(rows['name'])
+
+    def read_primary(self):
+        """Flag baris encoding registrasi untuk baris yang terisi"""
+        return self.table['primary'][:self.count].astype(bool)
+
+    def is_consistent(self, db_version, db_count):
+        """Cek konsistensi index dengan state tabel employees di database"""
+        return self.db_version == db_version and self.count == db_count
+
+    def flush(self):
+        self._mmap.flush()
+
+    @classmethod
+    def open(cls, path):
+        """Membuka file index; mengembalikan None jika tidak ada atau rusak"""
+        if not os.path.exists(path):
+            return None
+        try:
+            mmap = np.memmap(path, dtype=np.uint8, mode='r+')
+            header = mmap[:HEADER_SIZE].view(HEADER_DTYPE)[0]
+            if (header['magic'] != INDEX_MAGIC or header['version'] != INDEX_VERSION
+                    or header['dim'] != EMBEDDING_DIM or header['superseded']):
+                return None
+            expected = cls._file_size(int(header['capacity']),
+                                      _table_dtype(int(header['id_width']), int(header['name_width'])))
+            if mmap.shape[0] != expected or header['count'] > header['capacity']:
+                return None
+            return cls(path, mmap)
+        except (OSError, ValueError) as e:
+            print(f"Error opening embedding index: {e}")
+            return None
+
+    @classmethod
+    def build(cls, path, employee_ids, names, encodings, db_version, capacity=None, primary=None):
+        """Menulis file index baru secara atomik (file sementara lalu os.replace).
+
+        primary menandai baris encoding registrasi; default baris pertama tiap pegawai.
+        """
+        count = len(employee_ids)
+        if primary is None:
+            first_rows = {}
+            for row, employee_id in enumerate(employee_ids):
+                first_rows.setdefault(employee_id, row)
+            primary = np.zeros(count, dtype=bool)
+            primary[list(first_rows.values())] = True
+        capacity = max(capacity or 0, count, 1)
+        id_width = max([MIN_ID_WIDTH] + [len(_encode_text(v)) for v in employee_ids])
+        name_width = max([MIN_NAME_WIDTH] + [len(_encode_text(v)) for v in names])
+        table_dtype = _table_dtype(id_width, name_width)
+
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        mmap = np.memmap(tmp_path, dtype=np.uint8, mode='w+',
+                         shape=(cls._file_size(capacity, table_dtype),))
+        header = mmap[:HEADER_SIZE].view(HEADER_DTYPE)
+        header['magic'] = INDEX_MAGIC
+        header['version'] = INDEX_VERSION
+        header['dim'] = EMBEDDING_DIM
+        header['capacity'] = capacity
+        header['count'] = count
+        header['id_width'] = id_width
+        header['name_width'] = name_width
+        header['db_version'] = db_version
+
+        index = cls(tmp_path, mmap)
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(count, EMBEDDING_DIM)
+        index.encodings[:count] = encodings
+        index.sq_norms[:count] = np.einsum('ij,ij->i', encodings, encodings)
+        index.table['employee_id'][:count] = [_encode_text(v) for v in employee_ids]
+        index.table['name'][:count] = [_encode_text(v) for v in names]
+        index.table['primary'][:count] = primary
+        index.flush()
+        del index, header, mmap
+
+        # Tandai file lama lebih dulu: di Windows file yang sedang di-map tidak bisa diganti
+        old = cls.open(path)
+        if old is not None:
+            old.mark_superseded()
+            del old
+        try:
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error replacing embedding index: {e}")
+            os.remove(tmp_path)
+            return None
+        return cls.open(path)
+
+    @staticmethod
+    def _file_size(capacity, table_dtype):
+        return HEADER_SIZE + capacity * (EMBEDDING_DIM * 4 + 4 + table_dtype.itemsize)
@@ -0,0 +1,83 @@
+"""
+Format biner untuk menyimpan face encoding di database
+Menggantikan BLOB hasil pickle dengan float32 mentah yang diberi header versi
+"""
+import io
+import pickle
+import struct
+import numpy as np
+
+# Dimensi vektor face encoding dari dlib
+EMBEDDING_DIM = 128
+
+# Header 4 byte: magic 'FE', versi format, 1 byte cadangan.
+# Panjang header sama dengan satu float32 sehingga data tetap rata (aligned).
+ENCODING_MAGIC = b'FE'
+ENCODING_VERSION = 1
+ENCODING_HEADER = struct.pack('<2sBB', ENCODING_MAGIC, ENCODING_VERSION, 0)
+ENCODING_RECORD_SIZE = len(ENCODING_HEADER) + EMBEDDING_DIM * 4
+
+_HEADER_WORD = np.frombuffer(ENCODING_HEADER, dtype='<u4')[0]
+_RECORD_FLOATS = ENCODING_RECORD_SIZE // 4
+
+
+def encode_face_encoding(face_encoding):
+    """Mengubah face encoding menjadi BLOB float32 little-endian berheader"""
+    encoding = np.asarray(face_encoding, dtype='<f4').reshape(EMBEDDING_DIM)
+    return ENCODING_HEADER + encoding.tobytes()
+
+
+def is_encoded_blob(blob):
+    """Cek apakah BLOB sudah memakai format biner versi sekarang"""
+    return (blob is not None and len(blob) == ENCODING_RECORD_SIZE
+            and bytes(blob[:len(ENCODING_HEADER)]) == ENCODING_HEADER)
+
+
+def decode_face_encoding(blob):
+    """Mengubah BLOB menjadi array float32 (128,)"""
+    if not is_encoded_blob(blob):
+        raise ValueError("Format face encoding tidak dikenali")
+    return np.frombuffer(blob, dtype='<f4', offset=len(ENCODING_HEADER)).astype(np.float32)
+
+
+def decode_face_encodings(blobs):
+    """Decode banyak BLOB sekaligus menjadi matriks (N, 128) float32.
+
+    Semua BLOB digabung menjadi satu buffer lalu dibaca dengan satu
+    np.frombuffer, tanpa membuat array per baris. Mengembalikan
+    (matriks, mask_valid); baris dengan header salah bernilai nol.
+    """
+    blobs = list(blobs)
+    if not blobs:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32), np.zeros(0, dtype=bool)
+
+    sized = np.fromiter((blob is not None and len(blob) == ENCODING_RECORD_SIZE for blob in blobs),
+                        dtype=bool, count=len(blobs))
+    empty = bytes(ENCODING_RECORD_SIZE)
+    buffer = b''.join(blob if ok else empty for blob, ok in zip(blobs, sized))
+
+    raw = np.frombuffer(buffer, dtype='<u4').reshape(len(blobs), _RECORD_FLOATS)
+    valid = sized & (raw[:, 0] == _HEADER_WORD)
+    matrix = raw[:, 1:].view('<f4').astype(np.float32)
+    matrix[~valid] = 0
+    return matrix, valid
+
+
+class _NumpyOnlyUnpickler(pickle.Unpickler):
+    """Unpickler terbatas untuk data lama: hanya mengizinkan objek numpy"""
+    _ALLOWED = {
+        ('numpy', 'ndarray'),
+        ('numpy', 'dtype'),
+        ('numpy.core.multiarray', '_reconstruct'),
+        ('numpy._core.multiarray', '_reconstruct'),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) not in self._ALLOWED:
+            raise pickle.UnpicklingError(f"Objek tidak diizinkan: {module}.{name}")
+        return super().find_class(module, name)
+
+
+def load_legacy_encoding(blob):
+    """Membaca BLOB lama hasil pickle.dumps(numpy array) secara aman"""
+    return np.asarray(_NumpyOnlyUnpickler(io.BytesIO(blob)).load(), dtype=np.float32).reshape(EMBEDDING_DIM)
@@ -0,0 +1,89 @@
+"""
+Fan-out event absensi ke banyak client Server-Sent Events (SSE)
+"""
+import json
+import queue
+import threading
+import config
+
+
+class Subscriber:
+    """Satu koneksi SSE dengan buffer event terbatas"""
+
+    def __init__(self, size):
+        self.queue = queue.Queue(maxsize=size)
+        self.dropped = False
+
+
+class EventBroadcaster:
+    """Mengirim setiap event ke semua subscriber tanpa pernah memblok publisher.
+
+    Event diformat ke teks SSE sekali saja lalu dibagikan ke semua buffer.
+    Subscriber yang buffernya penuh (client lambat) diputus; EventSource di
+    browser akan reconnect dan memuat ulang data lengkap.
+    """
+
+    def __init__(self, client_queue_size=None, max_clients=None, keepalive=None):
+        self.client_queue_size = client_queue_size or config.SSE_CLIENT_QUEUE_SIZE
+        self.max_clients = max_clients or config.SSE_MAX_CLIENTS
+        self.keepalive = keepalive or config.SSE_KEEPALIVE_SECONDS
+
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._event_id = 0
+        self.dropped_total = 0
+
+    @property
+    def client_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        """Mendaftarkan client baru; None jika jumlah client sudah maksimum"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            subscriber = Subscriber(self.client_queue_size)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data):
+        """Mengirim event ke semua client yang terhubung"""
+        with self._lock:
+            self._event_id += 1
+            message = f"id: {self._event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+            subscribers = tuple(self._subscribers)
+
+        slow = []
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except queue.Full:
+                subscriber.dropped = True
+                slow.append(subscriber)
+
+        if slow:
+            with self._lock:
+                self._subscribers.difference_update(slow)
+                self.dropped_total += len(slow)
+
+    def stream(self, subscriber):
+        """Generator teks SSE untuk satu client (dipakai sebagai body Response)"""
+        try:
+            # Jeda reconnect browser jika koneksi terputus
+            yield "retry: 3000\n\n"
+            while not subscriber.dropped:
+                try:
+                    message = subscriber.queue.get(timeout=self.keepalive)
+                except queue.Empty:
+                    # Komentar keepalive: menjaga koneksi & mendeteksi client yang sudah pergi
+                    yield ": keepalive\n\n"
+                    continue
+                if subscriber.dropped:
+                    break
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
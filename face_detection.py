@@ -0,0 +1,89 @@
+"""
+Pipeline deteksi wajah: deteksi pada salinan gambar yang diperkecil,
+kotak wajah dikembalikan ke resolusi asli, encoding dihitung dari gambar asli
+"""
+import cv2
+import face_recognition
+import config
+from metrics import metrics
+
+
+def detection_scale(image_shape, target_short_side=None):
+    """Faktor skala (<= 1) supaya sisi pendek gambar menjadi target_short_side"""
+    if target_short_side is None:
+        target_short_side = config.DETECTION_SHORT_SIDE
+    short_side = min(image_shape[:2])
+    if not target_short_side or short_side <= target_short_side:
+        return 1.0
+    return target_short_side / short_side
+
+
+def _scale_locations(face_locations, scale, image_shape):
+    """Memetakan kotak (top, right, bottom, left) dari gambar kecil ke resolusi asli"""
+    height, width = image_shape[:2]
+    scaled = []
+    for top, right, bottom, left in face_locations:
+        scaled.append((
+            max(0, int(round(top / scale))),
+            min(width, int(round(right / scale))),
+            min(height, int(round(bottom / scale))),
+            max(0, int(round(left / scale))),
+        ))
+    return scaled
+
+
+def detect_faces(rgb_image, target_short_side=None, model=None, upsample=None, still_image=False):
+    """Mendeteksi wajah pada gambar RGB, hasil dalam koordinat resolusi asli.
+
+    Deteksi dijalankan pada salinan yang diperkecil. Untuk foto tunggal
+    (still_image=True: upload, registrasi) yang tidak menghasilkan wajah dan
+    config.DETECTION_RETRY_FULL_RES aktif, deteksi diulang pada resolusi asli
+    (wajah terlalu kecil untuk gambar yang diperkecil). Jika model tidak
+    ditentukan pemanggil dan masih tidak ada wajah, foto tunggal juga diulang
+    dengan config.FACE_DETECTION_FALLBACK_MODEL (mis. CNN) pada salinan yang
+    diperkecil, sehingga model mahal hanya dipakai untuk foto yang sulit.
+    Frame video tidak diulang agar frame kosong tetap murah.
+    """
+    fallback = config.FACE_DETECTION_FALLBACK_MODEL if model is None and still_image else None
+    model = model or config.FACE_DETECTION_MODEL
+    if upsample is None:
+        upsample = config.NUMBER_OF_TIMES_TO_UPSAMPLE
+
+    scale = detection_scale(rgb_image.shape, target_short_side)
+    small = rgb_image
+    face_locations = []
+    if scale < 1.0:
+        small = cv2.resize(rgb_image, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        with metrics.timer('face_locations'):
+            face_locations = face_recognition.face_locations(
+                small, number_of_times_to_upsample=upsample, model=model)
+        if face_locations:
+            return _scale_locations(face_locations, scale, rgb_image.shape)
+
+    if scale >= 1.0 or (still_image and config.DETECTION_RETRY_FULL_RES):
+        with metrics.timer('face_locations_full_res'):
+            face_locations = face_recognition.face_locations(
+                rgb_image, number_of_times_to_upsample=upsample, model=model)
+        if face_locations:
+            return face_locations
+
+    if fallback and fallback != model:
+        with metrics.timer('face_locations_fallback'):
+            face_locations = face_recognition.face_locations(
+                small, number_of_times_to_upsample=upsample, model=fallback)
+        if face_locations and scale < 1.0:
+            return _scale_locations(face_locations, scale, rgb_image.shape)
+    return face_locations
+
+
+def detect_and_encode_faces(rgb_image, target_short_side=None, still_image=False):
+    """Deteksi (gambar diperkecil) lalu encoding dari gambar resolusi asli.
+
+    Mengembalikan (face_locations, face_encodings).
+    """
+    face_locations = detect_faces(rgb_image, target_short_side, still_image=still_image)
+    if len(face_locations) == 0:
+        return [], []
+    with metrics.timer('face_encodings'):
+        face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
+    return face_locations, face_encodings
@@ -1,37 +1,588 @@
 """
 Modul Face Recognition untuk Sistem Absensi
 Menangani deteksi dan pengenalan wajah
+
+Galeri (pencocokan) hanya butuh numpy; cv2, face_recognition dan dlib
+diimpor saat fungsi kamera / gambar pertama kali dipakai sehingga aplikasi
+web bisa mulai melayani halaman sebelum model dlib selesai dimuat.
 """
-import cv2
-import face_recognition
 import numpy as np
-import pickle
+import threading
+from contextlib import contextmanager
 import config
+from encoding_format import EMBEDDING_DIM, decode_face_encodings
+from embedding_index import EmbeddingIndex, index_lock
+from ann_index import IVFIndex
+
+# Jumlah query sampel untuk mengukur recall index ANN terhadap scan exact
+RECALL_SAMPLE_SIZE = 200
+RECALL_NOISE_STD = 0.03
+
 
 class FaceRecognitionModule:
-    def __init__(self):
-        self.known_face_encodings = []
-        self.known_face_names = []
-        self.known_face_ids = []
-    
-    def load_known_faces(self, face_data):
-        """Memuat data wajah yang sudah terdaftar"""
-        self.known_face_encodings = []
-        self.known_face_names = []
-        self.known_face_ids = []
-        
-        for employee_id, name, face_encoding_blob in face_data:
-            if face_encoding_blob:
+    def __init__(self, capacity=256, template_matching=None):
+        self._lock = threading.RLock()
+        # 'min' = setiap template satu baris galeri, 'centroid' = satu baris rata-rata per pegawai
+        self.template_matching = template_matching or config.TEMPLATE_MATCHING
+        self._generation = 0  # naik setiap isi galeri berubah (untuk invalidasi cache)
+        self._write_depth = 0  # kedalaman _writing() bersarang di thread pemegang _lock
+        self._init_gallery(capacity)
+    
+    def _init_gallery(self, capacity):
+        """Mengalokasikan galeri wajah sebagai matriks float32 yang contiguous"""
+        capacity = max(int(capacity), 1)
+        self._encodings = np.zeros((capacity, EMBEDDING_DIM), dtype=np.float32)
+        self._sq_norms = np.zeros(capacity, dtype=np.float32)
+        self._ids = np.empty(capacity, dtype=object)
+        self._names = np.empty(capacity, dtype=object)
+        self._index = {}  # employee_id -> list baris di matriks galeri (satu per template)
+        self._max_templates = 1  # jumlah baris terbanyak milik satu pegawai
+        self._size = 0
+        self._index_file = None  # EmbeddingIndex (memmap) jika galeri disimpan di disk
+        self._index_version = None
+        self._index_generation = None  # generation header index yang terakhir dibaca / ditulis
+        self._ann = None  # IVFIndex jika config.MATCHING_MODE == 'ivf'
+        self._ann_trained_size = 0
+    
+    def _ensure_capacity(self, capacity):
+        """Memperbesar buffer galeri (kelipatan dua) jika kapasitas tidak cukup"""
+        current = self._encodings.shape[0]
+        if capacity <= current:
+            return
+        new_capacity = max(capacity, current * 2)
+        
+        if self._index_file is not None and self._rebuild_index_file(new_capacity):
+            return
+        
+        n = self._size
+        encodings = np.zeros((new_capacity, EMBEDDING_DIM), dtype=np.float32)
+        encodings[:n] = self._encodings[:n]
+        sq_norms = np.zeros(new_capacity, dtype=np.float32)
+        sq_norms[:n] = self._sq_norms[:n]
+        ids = np.empty(new_capacity, dtype=object)
+        ids[:n] = self._ids[:n]
+        names = np.empty(new_capacity, dtype=object)
+        names[:n] = self._names[:n]
+        
+        self._encodings = encodings
+        self._sq_norms = sq_norms
+        self._ids = ids
+        self._names = names
+        self._index_file = None
+    
+    @property
+    def known_face_encodings(self):
+        """Matriks (N, 128) float32 berisi encoding wajah yang terdaftar"""
+        return self._encodings[:self._size]
+    
+    @property
+    def known_face_ids(self):
+        return self._ids[:self._size]
+    
+    @property
+    def known_face_names(self):
+        return self._names[:self._size]
+    
+    @property
+    def generation(self):
+        return self._generation
+    
+    def __len__(self):
+        return self._size
+    
+    def load_known_faces(self, face_data, template_data=()):
+        """Memuat data wajah yang sudah terdaftar.
+        
+        Matriks galeri dibangun langsung dari BLOB hasil query dengan satu
+        np.frombuffer, sehingga waktu startup sebanding dengan jumlah byte.
+        template_data berisi template tambahan (employee_id, name, blob); pada
+        mode 'min' setiap template menjadi baris sendiri, pada mode 'centroid'
+        baris pegawai berisi rata-rata encoding registrasi dan template-nya.
+        """
+        if face_data:
+            employee_ids, names, blobs = zip(*face_data)
+        else:
+            employee_ids, names, blobs = (), (), ()
+        matrix, valid = decode_face_encodings(blobs)
+        
+        for row in np.flatnonzero(~valid):
+            if blobs[row]:
+                print(f"Error loading face encoding for {names[row]}: format tidak dikenali")
+        
+        rows = np.flatnonzero(valid)
+        employee_ids = [employee_ids[i] for i in rows]
+        names = [names[i] for i in rows]
+        matrix = matrix[rows]
+        
+        if template_data:
+            matrix, employee_ids, names = self._merge_templates(matrix, employee_ids, names, template_data)
+        
+        with self._lock:
+            n = len(employee_ids)
+            self._init_gallery(n)
+            self._encodings[:n] = matrix
+            self._sq_norms[:n] = np.einsum('ij,ij->i', self._encodings[:n], self._encodings[:n])
+            self._ids[:n] = employee_ids
+            self._names[:n] = names
+            self._build_id_index(employee_ids)
+            self._size = n
+            self._rebuild_ann()
+    
+    def _merge_templates(self, matrix, employee_ids, names, template_data):
+        """Menggabungkan template tambahan ke encoding registrasi"""
+        template_ids, _, template_blobs = zip(*template_data)
+        templates, valid = decode_face_encodings(template_blobs)
+        
+        # Template hanya dipakai untuk pegawai yang encoding registrasinya valid
+        primary_row = {employee_id: i for i, employee_id in enumerate(employee_ids)}
+        keep = [i for i in np.flatnonzero(valid) if template_ids[i] in primary_row]
+        owner_rows = np.array([primary_row[template_ids[i]] for i in keep], dtype=np.int64)
+        templates = templates[keep]
+        
+        if self.template_matching == 'centroid':
+            sums = matrix.astype(np.float32)
+            np.add.at(sums, owner_rows, templates)
+            counts = np.bincount(owner_rows, minlength=len(matrix)) + 1
+            return sums / counts[:, None], employee_ids, names
+        
+        return (np.concatenate([matrix, templates]),
+                employee_ids + [employee_ids[row] for row in owner_rows],
+                names + [names[row] for row in owner_rows])
+    
+    def _build_id_index(self, employee_ids, primary=None):
+        # Satu dict comprehension untuk baris pertama tiap pegawai (urutan terbalik
+        # supaya baris terkecil yang tersimpan); baris template ditambahkan setelahnya
+        n = len(employee_ids)
+        index = {employee_id: [row] for row, employee_id
+                 in zip(range(n - 1, -1, -1), reversed(employee_ids))}
+        if len(index) < n:
+            for row, employee_id in enumerate(employee_ids):
+                rows = index[employee_id]
+                if rows[0] != row:
+                    rows.append(row)
+            # Setelah _remove_row memindah baris, baris registrasi belum tentu yang
+            # terkecil; rows[0] harus tetap baris registrasi (dipakai update_face)
+            if primary is not None:
+                for row in np.flatnonzero(primary):
+                    rows = index[employee_ids[row]]
+                    if rows[0] != row:
+                        rows.remove(row)
+                        rows.insert(0, row)
+        self._index = index
+        self._max_templates = max(map(len, index.values()), default=1)
+        self._generation += 1
+    
+    def attach_index(self, index):
+        """Memakai file index (memmap) langsung sebagai penyimpanan galeri.
+        
+        Matriks tidak disalin ke memori process, sehingga startup hampir instan
+        dan beberapa worker berbagi satu salinan lewat page cache.
+        """
+        employee_ids, names = index.read_ids_names()
+        n = len(employee_ids)
+        with self._lock:
+            self._encodings = index.encodings
+            self._sq_norms = index.sq_norms
+            self._ids = np.empty(index.capacity, dtype=object)
+            self._ids[:n] = employee_ids
+            self._names = np.empty(index.capacity, dtype=object)
+            self._names[:n] = names
+            self._build_id_index(employee_ids, index.read_primary())
+            self._size = n
+            self._index_file = index
+            self._index_version = index.db_version
+            self._index_generation = index.generation
+            self._rebuild_ann()
+    
+    @contextmanager
+    def _writing(self):
+        """Konteks untuk setiap perubahan galeri.
+        
+        Jika galeri memakai file index, lock antar process dipegang dan state
+        dibaca ulang dari file lebih dulu: process lain mungkin sudah menambah
+        atau memindah baris sejak terakhir dibaca.
+        """
+        with self._lock:
+            index_file = self._index_file
+            if index_file is None or self._write_depth:
+                self._write_depth += 1
+                try:
+                    yield
+                finally:
+                    self._write_depth -= 1
+                return
+            
+            with index_lock(index_file.path):
+                self._write_depth += 1
                 try:
-                    face_encoding = pickle.loads(face_encoding_blob)
-                    self.known_face_encodings.append(face_encoding)
-                    self.known_face_names.append(name)
-                    self.known_face_ids.append(employee_id)
-                except Exception as e:
-                    print(f"Error loading face encoding for {name}: {e}")
+                    self._refresh_from_index()
+                    yield
+                finally:
+                    self._write_depth -= 1
+    
+    def build_index(self, path, db_version):
+        """Menulis galeri saat ini ke file index lalu memakainya sebagai penyimpanan"""
+        with self._lock, index_lock(path):
+            n = self._size
+            index = EmbeddingIndex.build(path, list(self._ids[:n]), list(self._names[:n]),
+                                         self._encodings[:n], db_version,
+                                         capacity=self._encodings.shape[0],
+                                         primary=self._primary_flags())
+            if index is not None:
+                self.attach_index(index)
+            return index
+    
+    def set_index_version(self, db_version):
+        """Mencatat versi galeri di database setelah perubahan sudah ditulis ke index"""
+        with self._writing():
+            if self._index_file is not None:
+                self._index_file.set_state(self._size, db_version)
+                self._index_version = db_version
+                self._index_generation = self._index_file.generation
+    
+    def _rebuild_index_file(self, capacity):
+        """Menulis ulang file index (kapasitas/lebar tabel baru); False jika gagal"""
+        index_file = self._index_file
+        n = self._size
+        employee_ids = list(self._ids[:n])
+        names = list(self._names[:n])
+        encodings = np.array(self._encodings[:n])
+        primary = self._primary_flags()
+        
+        # Lepas memmap lama sebelum file diganti
+        self._encodings = np.array(self._encodings)
+        self._sq_norms = np.array(self._sq_norms)
+        self._index_file = None
+        
+        index = EmbeddingIndex.build(index_file.path, employee_ids, names, encodings,
+                                     self._index_version or 0, capacity=capacity,
+                                     primary=primary)
+        if index is None:
+            return False
+        self.attach_index(index)
+        return True
+    
+    def _refresh_from_index(self):
+        """Membuka ulang index jika process lain sudah mengubah atau mengganti file"""
+        index_file = self._index_file
+        if index_file is None:
+            return
+        if index_file.superseded:
+            index = EmbeddingIndex.open(index_file.path)
+            if index is not None:
+                self.attach_index(index)
+        elif index_file.generation != self._index_generation:
+            self.attach_index(index_file)
+    
+    def _sync_index_row(self, row):
+        """Menyalin id/nama satu baris ke tabel index dan memperbarui jumlah baris"""
+        index_file = self._index_file
+        if index_file is None:
+            return
+        if row < self._size and not index_file.fits(self._ids[row], self._names[row]):
+            self._rebuild_index_file(self._encodings.shape[0])
+            return
+        if row < self._size:
+            index_file.write_row(row, self._ids[row], self._names[row], self._is_primary(row))
+        index_file.set_state(self._size)
+        self._index_generation = index_file.generation
+    
+    def _is_primary(self, row):
+        """Apakah baris ini encoding registrasi (baris baru yang belum tercatat juga)"""
+        rows = self._index.get(self._ids[row])
+        return not rows or rows[0] == row
+    
+    def _primary_flags(self):
+        """Flag _is_primary untuk semua baris terisi"""
+        primary = np.ones(self._size, dtype=bool)
+        for rows in self._index.values():
+            if len(rows) > 1:
+                primary[rows[1:]] = False
+        return primary
+    
+    def _rebuild_ann(self):
+        """Membangun index ANN sesuai config.MATCHING_MODE.
+        
+        Centroid dilatih ulang hanya jika galeri sudah tumbuh lebih dari dua kali
+        ukuran saat training; selain itu baris cukup dimasukkan ulang ke list.
+        """
+        n = self._size
+        if config.MATCHING_MODE != 'ivf' or n < config.ANN_MIN_GALLERY_SIZE:
+            self._ann = None
+            return
+        
+        if self._ann is not None and n <= 2 * self._ann_trained_size:
+            self._ann.assign_all(self._encodings[:n])
+            return
+        
+        nlist = config.IVF_NLIST or int(round(np.sqrt(n)))
+        self._ann = IVFIndex.train(self._encodings[:n], nlist, nprobe=config.IVF_NPROBE)
+        self._ann_trained_size = n
+        if config.ANN_TARGET_RECALL:
+            self._tune_nprobe(config.ANN_TARGET_RECALL)
+    
+    def _ann_insert(self, row):
+        """Memasukkan baris baru ke index ANN (atau membangunnya jika perlu)"""
+        if self._ann is None or self._size > 2 * self._ann_trained_size:
+            self._rebuild_ann()
+        else:
+            self._ann.add(row, self._encodings[row])
+    
+    def _tune_nprobe(self, target_recall):
+        """Menaikkan nprobe (kelipatan dua) sampai recall@1 mencapai target"""
+        queries = self._sample_queries()
+        nprobe = max(1, config.IVF_NPROBE)
+        while True:
+            self._ann.nprobe = nprobe
+            recall = self.measure_recall(queries, k=1)
+            if recall >= target_recall or nprobe >= self._ann.nlist:
+                break
+            nprobe = min(nprobe * 2, self._ann.nlist)
+        print(f"Index IVF: {self._ann.nlist} cluster, nprobe={nprobe}, recall@1={recall:.3f}")
+    
+    def _sample_queries(self, size=RECALL_SAMPLE_SIZE, seed=0):
+        """Query uji: baris galeri acak ditambah noise kecil (mirip foto lain orang yang sama)"""
+        rng = np.random.default_rng(seed)
+        rows = rng.choice(self._size, min(size, self._size), replace=False)
+        noise = rng.normal(0.0, RECALL_NOISE_STD, (len(rows), EMBEDDING_DIM)).astype(np.float32)
+        return self._encodings[rows] + noise
+    
+    def measure_recall(self, queries, k=1):
+        """Mengukur recall@k pencocokan approximate terhadap scan exact"""
+        with self._lock:
+            if len(queries) == 0:
+                return 1.0
+            hits = 0
+            total = 0
+            for query in queries:
+                exact = {employee_id for employee_id, _ in self.match(query, k, exact=True)}
+                approx = {employee_id for employee_id, _ in self.match(query, k)}
+                hits += len(exact & approx)
+                total += len(exact)
+            return hits / total if total else 1.0
+    
+    def match(self, face_encoding, k=1, exact=False):
+        """Mencari k wajah terdekat di galeri.
+        
+        Jarak euclidean dihitung dalam satu perkalian matriks-vektor
+        memakai ||g - q||^2 = ||g||^2 - 2 g.q + ||q||^2.
+        Pada mode 'ivf' hanya kandidat dari cluster terdekat yang dihitung,
+        kecuali exact=True.
+        Mengembalikan list (employee_id, distance) terurut dari yang terdekat.
+        """
+        with self._lock:
+            self._refresh_from_index()
+            n = self._size
+            if n == 0 or k <= 0:
+                return []
+            
+            query = np.asarray(face_encoding, dtype=np.float32).reshape(EMBEDDING_DIM)
+            if self._ann is not None and not exact:
+                rows = self._ann.candidates(query)
+                sq_distances = self._sq_norms[rows] - 2.0 * (self._encodings[rows] @ query)
+            else:
+                rows = None
+                sq_distances = self._sq_norms[:n] - 2.0 * (self._encodings[:n] @ query)
+            sq_distances += np.dot(query, query)
+            
+            # Pegawai dengan beberapa template bisa muncul di beberapa baris:
+            # ambil baris secukupnya lalu pakai jarak terkecil per pegawai
+            m = len(sq_distances)
+            k_rows = min(k * self._max_templates, m)
+            if k_rows == 0:
+                return []
+            if k_rows < m:
+                top = np.argpartition(sq_distances, k_rows - 1)[:k_rows]
+            else:
+                top = np.arange(m)
+            top = top[np.argsort(sq_distances[top])]
+            distances = np.sqrt(np.maximum(sq_distances[top], 0.0))
+            if rows is not None:
+                top = rows[top]
+            
+            return self._unique_matches(top, distances, k)
+    
+    def match_batch(self, face_encodings, k=1):
+        """Seperti match() untuk banyak encoding sekaligus.
+        
+        Pada mode exact seluruh jarak (Q, N) dihitung dengan satu perkalian
+        matriks-matriks. Mengembalikan list hasil match() per encoding.
+        """
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        with self._lock:
+            self._refresh_from_index()
+            n = self._size
+            if n == 0 or k <= 0 or len(queries) == 0:
+                return [[] for _ in range(len(queries))]
+            if self._ann is not None:
+                return [self.match(query, k) for query in queries]
+            
+            sq_distances = self._sq_norms[None, :n] - 2.0 * (queries @ self._encodings[:n].T)
+            sq_distances += np.einsum('ij,ij->i', queries, queries)[:, None]
+            
+            k_rows = min(k * self._max_templates, n)
+            if k_rows < n:
+                top = np.argpartition(sq_distances, k_rows - 1, axis=1)[:, :k_rows]
+            else:
+                top = np.broadcast_to(np.arange(n), sq_distances.shape)
+            top_distances = np.take_along_axis(sq_distances, top, axis=1)
+            order = np.argsort(top_distances, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_distances = np.sqrt(np.maximum(np.take_along_axis(top_distances, order, axis=1), 0.0))
+            
+            return [self._unique_matches(rows, distances, k)
+                    for rows, distances in zip(top, top_distances)]
+    
+    def _unique_matches(self, rows, distances, k):
+        """k pasangan (employee_id, distance) pertama dengan employee_id unik"""
+        if self._max_templates == 1:
+            return [(self._ids[i], float(d)) for i, d in zip(rows[:k], distances[:k])]
+        
+        results = []
+        seen = set()
+        for i, d in zip(rows, distances):
+            employee_id = self._ids[i]
+            if employee_id in seen:
+                continue
+            seen.add(employee_id)
+            results.append((employee_id, float(d)))
+            if len(results) == k:
+                break
+        return results
+    
+    def get_name(self, employee_id):
+        """Mendapatkan nama pegawai dari galeri"""
+        with self._lock:
+            rows = self._index.get(employee_id)
+            if rows is None:
+                return None
+            return self._names[rows[0]]
+    
+    def add_face(self, employee_id, name, face_encoding):
+        """Menambahkan satu wajah ke galeri tanpa memuat ulang seluruh data"""
+        with self._writing():
+            if employee_id in self._index:
+                return self.update_face(employee_id, face_encoding, name)
+            
+            self._index[employee_id] = [self._append_row(employee_id, name, face_encoding)]
+            return True
+    
+    def update_face(self, employee_id, face_encoding, name=None):
+        """Mengganti encoding utama (dan opsional nama) wajah yang sudah ada di galeri"""
+        with self._writing():
+            rows = self._index.get(employee_id)
+            if rows is None:
+                return False
+            
+            if name is None:
+                name = self._names[rows[0]]
+            self._replace_row(rows[0], employee_id, name, face_encoding)
+            for row in rows[1:]:
+                self._names[row] = name
+                self._sync_index_row(row)
+            return True
+    
+    def set_templates(self, employee_id, name, face_encodings):
+        """Mengganti semua template wajah satu pegawai (encoding registrasi dulu).
+        
+        Pada mode 'centroid' template dirata-rata menjadi satu baris.
+        """
+        face_encodings = np.asarray(face_encodings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        if len(face_encodings) == 0:
+            return self.remove_face(employee_id)
+        if self.template_matching == 'centroid':
+            face_encodings = face_encodings.mean(axis=0, keepdims=True)
+        
+        with self._writing():
+            rows = self._index.get(employee_id, [])
+            count = len(face_encodings)
+            self._index[employee_id] = rows[:count]
+            
+            # Template yang berlebih dihapus dulu (urut turun supaya baris yang
+            # masih akan dihapus tidak ikut dipindah)
+            for row in sorted(rows[count:], reverse=True):
+                self._remove_row(row)
+            
+            for i, face_encoding in enumerate(face_encodings):
+                # List dibaca ulang: penulisan index file bisa membangun ulang self._index
+                rows = self._index[employee_id]
+                if i < len(rows):
+                    self._replace_row(rows[i], employee_id, name, face_encoding)
+                else:
+                    row = self._append_row(employee_id, name, face_encoding)
+                    rows = self._index[employee_id]
+                    if row not in rows:
+                        rows.append(row)
+            
+            self._max_templates = max(self._max_templates, count)
+            return True
+    
+    def remove_face(self, employee_id):
+        """Menghapus wajah (semua template) dari galeri"""
+        with self._writing():
+            rows = self._index.pop(employee_id, None)
+            if rows is None:
+                return False
+            
+            # Urut turun supaya baris yang masih akan dihapus tidak ikut dipindah
+            for row in sorted(rows, reverse=True):
+                self._remove_row(row)
+            return True
+    
+    def _append_row(self, employee_id, name, face_encoding):
+        """Menambah baris baru di akhir galeri; mengembalikan nomor barisnya"""
+        self._ensure_capacity(self._size + 1)
+        row = self._size
+        self._set_row(row, employee_id, name, face_encoding)
+        self._size += 1
+        self._ann_insert(row)
+        self._sync_index_row(row)
+        return row
+    
+    def _replace_row(self, row, employee_id, name, face_encoding):
+        """Menulis ulang baris yang sudah ada (index file dan ANN ikut diperbarui)"""
+        self._set_row(row, employee_id, name, face_encoding)
+        self._sync_index_row(row)
+        if self._ann is not None:
+            self._ann.remove(row)
+            self._ann.add(row, self._encodings[row])
+    
+    def _remove_row(self, row):
+        """Menghapus satu baris (baris terakhir dipindah ke posisi yang kosong)"""
+        last = self._size - 1
+        if self._ann is not None:
+            self._ann.remove(row)
+            if row != last:
+                self._ann.move(last, row)
+        if row != last:
+            self._encodings[row] = self._encodings[last]
+            self._sq_norms[row] = self._sq_norms[last]
+            self._ids[row] = self._ids[last]
+            self._names[row] = self._names[last]
+            moved = self._index[self._ids[row]]
+            moved[moved.index(last)] = row
+        
+        self._ids[last] = None
+        self._names[last] = None
+        self._size = last
+        self._generation += 1
+        self._sync_index_row(row)
+    
+    def _set_row(self, row, employee_id, name, face_encoding):
+        """Menulis satu baris galeri beserta norm kuadratnya"""
+        encoding = np.asarray(face_encoding, dtype=np.float32).reshape(EMBEDDING_DIM)
+        self._encodings[row] = encoding
+        self._sq_norms[row] = np.dot(encoding, encoding)
+        self._ids[row] = employee_id
+        self._names[row] = name
+        self._generation += 1
     
     def capture_face_from_camera(self):
         """Mengambil foto wajah dari kamera"""
+        import cv2
+        import face_recognition
+        from face_detection import detect_faces
+        
         video_capture = cv2.VideoCapture(config.CAMERA_INDEX)
         video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, config.CAMERA_WIDTH)
         video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, config.CAMERA_HEIGHT)
@@ -51,7 +602,7 @@ class FaceRecognitionModule:
             
             # Deteksi wajah untuk preview
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_locations = face_recognition.face_locations(rgb_frame)
+            face_locations = detect_faces(rgb_frame)
             
             # Gambar kotak di sekitar wajah
             for (top, right, bottom, left) in face_locations:
@@ -90,6 +641,10 @@ class FaceRecognitionModule:
     
     def recognize_face_from_camera(self, callback=None):
         """Mengenali wajah dari kamera secara real-time"""
+        import cv2
+        from face_detection import detect_and_encode_faces
+        from face_tracking import FaceTracker
+        
         video_capture = cv2.VideoCapture(config.CAMERA_INDEX)
         video_capture.set(cv2.CAP_PROP_FRAME_WIDTH, config.CAMERA_WIDTH)
         video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, config.CAMERA_HEIGHT)
@@ -98,6 +653,7 @@ class FaceRecognitionModule:
         
         process_this_frame = True
         recognized_employee = None
+        tracker = FaceTracker(self) if config.FACE_TRACKING_ENABLED else None
         
         while True:
             ret, frame = video_capture.read()
@@ -107,43 +663,45 @@ class FaceRecognitionModule:
             # Flip untuk efek mirror
             frame = cv2.flip(frame, 1)
             
+            if tracker is not None:
+                # Mode tracking: deteksi dan encoding hanya saat dibutuhkan,
+                # di antaranya kotak wajah diikuti correlation tracker
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                tracks = tracker.process(rgb_frame)
+                
+                face_locations = [track.box for track in tracks]
+                face_names = [track.name for track in tracks]
+                
+                # Callback sekali per track, setelah identitasnya dikonfirmasi voting
+                for track in tracks:
+                    if track.employee_id is not None and not track.announced:
+                        track.announced = True
+                        recognized_employee = track.employee_id
+                        if callback:
+                            callback(track.employee_id, track.name)
+            
             # Proses setiap frame kedua untuk performa lebih baik
-            if process_this_frame:
-                # Resize untuk proses lebih cepat
-                small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-                rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+            elif process_this_frame:
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 
-                # Deteksi wajah
-                face_locations = face_recognition.face_locations(rgb_small_frame)
-                face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+                # Deteksi pada frame yang diperkecil, encoding dari frame asli
+                face_locations, face_encodings = detect_and_encode_faces(rgb_frame)
                 
                 face_names = []
                 face_ids = []
                 
                 for face_encoding in face_encodings:
-                    # Cek kecocokan dengan tolerance
-                    matches = face_recognition.compare_faces(
-                        self.known_face_encodings, 
-                        face_encoding, 
-                        tolerance=config.TOLERANCE
-                    )
                     name = "Unknown"
                     employee_id = None
                     
-                    # Hitung jarak wajah untuk validasi tambahan
-                    face_distances = face_recognition.face_distance(
-                        self.known_face_encodings, 
-                        face_encoding
-                    )
-                    
-                    if len(face_distances) > 0:
-                        best_match_index = np.argmin(face_distances)
-                        min_distance = face_distances[best_match_index]
+                    best = self.match(face_encoding, k=1)
+                    if best:
+                        best_id, min_distance = best[0]
                         
-                        # Validasi ganda: harus match DAN distance di bawah threshold
-                        if matches[best_match_index] and min_distance <= config.MAX_FACE_DISTANCE:
-                            name = self.known_face_names[best_match_index]
-                            employee_id = self.known_face_ids[best_match_index]
+                        # Validasi ganda: harus dalam tolerance DAN di bawah threshold
+                        if min_distance <= config.TOLERANCE and min_distance <= config.MAX_FACE_DISTANCE:
+                            employee_id = best_id
+                            name = self.get_name(employee_id)
                             
                             if callback and recognized_employee != employee_id:
                                 recognized_employee = employee_id
@@ -156,13 +714,7 @@ class FaceRecognitionModule:
             
             # Gambar hasil
             for (top, right, bottom, left), name in zip(face_locations, face_names):
-                # Scale back koordinat
-                top *= 4
-                right *= 4
-                bottom *= 4
-                left *= 4
-                
-                # Gambar kotak
+                # Gambar kotak (koordinat sudah dalam resolusi asli)
                 color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
                 cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
                 
@@ -187,9 +739,12 @@ class FaceRecognitionModule:
     
     def encode_face_from_image(self, image_path):
         """Mengekstrak face encoding dari file gambar"""
+        import face_recognition
+        from face_detection import detect_and_encode_faces
+        
         try:
             image = face_recognition.load_image_file(image_path)
-            face_encodings = face_recognition.face_encodings(image)
+            face_locations, face_encodings = detect_and_encode_faces(image, still_image=True)
             
             if len(face_encodings) > 0:
                 return face_encodings[0]
@@ -201,10 +756,14 @@ class FaceRecognitionModule:
     
     def detect_face_in_image(self, image):
         """Mendeteksi apakah ada wajah dalam gambar"""
+        import cv2
+        import face_recognition
+        from face_detection import detect_faces
+        
         if isinstance(image, np.ndarray):
             rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         else:
             rgb_image = face_recognition.load_image_file(image)
         
-        face_locations = face_recognition.face_locations(rgb_image)
+        face_locations = detect_faces(rgb_image, still_image=True)
         return len(face_locations) > 0
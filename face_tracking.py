@@ -0,0 +1,190 @@
+"""
+Pelacakan wajah antar frame untuk pengenalan real-time dari kamera
+Wajah dideteksi dan dikenali sekali, lalu kotaknya diikuti dengan
+correlation tracker dlib yang jauh lebih ringan dari deteksi HOG + encoding.
+Identitas track ditetapkan lewat voting beberapa frame, bukan satu frame.
+"""
+from collections import Counter, deque
+import dlib
+import face_recognition
+import numpy as np
+import config
+from face_detection import detect_faces
+
+# Minimal overlap (IoU) agar deteksi dianggap wajah yang sama dengan track
+TRACK_MATCH_IOU = 0.3
+
+
+def _iou(a, b):
+    """Intersection over union dua kotak (top, right, bottom, left)"""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    if right <= left or bottom <= top:
+        return 0.0
+    inter = (right - left) * (bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+
+def _is_match(distance):
+    """Validasi ganda: harus dalam tolerance DAN di bawah threshold"""
+    return distance <= config.TOLERANCE and distance <= config.MAX_FACE_DISTANCE
+
+
+class FaceTrack:
+    """Satu wajah yang diikuti antar frame beserta identitasnya.
+
+    observations menyimpan N hasil pencocokan terakhir (best_id, distance,
+    encoding); employee_id hanya terisi setelah identitas dikonfirmasi voting.
+    """
+
+    def __init__(self, track_id, rgb_frame, box, window=None):
+        self.track_id = track_id
+        self.tracker = dlib.correlation_tracker()
+        self.box = box
+        self.observations = deque(maxlen=window or config.TRACK_VOTE_WINDOW)
+        self.employee_id = None
+        self.name = "Unknown"
+        self.distance = None  # jarak embedding rata-rata ke identitas terbaik
+        self.announced = False  # callback untuk identitas ini sudah dipanggil
+        self.identified_at = None  # nomor frame identifikasi terakhir
+        self.restart(rgb_frame, box)
+
+    def restart(self, rgb_frame, box):
+        """Menempatkan ulang tracker pada kotak hasil deteksi"""
+        top, right, bottom, left = box
+        self.tracker.start_track(rgb_frame, dlib.rectangle(left, top, right, bottom))
+        self.box = box
+
+    def update(self, rgb_frame):
+        """Menggeser kotak ke frame baru; mengembalikan skor kualitas tracker"""
+        quality = self.tracker.update(rgb_frame)
+        position = self.tracker.get_position()
+        height, width = rgb_frame.shape[:2]
+        self.box = (
+            max(0, int(position.top())),
+            min(width, int(position.right())),
+            min(height, int(position.bottom())),
+            max(0, int(position.left())),
+        )
+        # Kotak keluar dari frame: dianggap hilang
+        if self.box[1] <= self.box[3] or self.box[2] <= self.box[0]:
+            return 0.0
+        return quality
+
+
+class FaceTracker:
+    """Mengelola track wajah untuk satu aliran frame kamera.
+
+    Deteksi penuh hanya dijalankan jika ada track yang hilang, setiap
+    redetect_interval frame (untuk menangkap wajah baru), atau setiap
+    idle_detect_interval frame selama belum ada wajah.
+    Encoding + pencocokan galeri dijalankan setiap vote_interval frame selama
+    identitas track belum dikonfirmasi, dan setiap reidentify_interval frame
+    sesudahnya. Identitas dikonfirmasi jika vote_agree observasi terakhir
+    setuju, atau jika embedding rata-rata observasi cocok dengan galeri.
+    """
+
+    def __init__(self, gallery, redetect_interval=None, reidentify_interval=None, min_quality=None,
+                 idle_detect_interval=None, vote_interval=None, vote_agree=None):
+        self.gallery = gallery
+        self.vote_interval = vote_interval or config.TRACK_VOTE_INTERVAL
+        self.vote_agree = vote_agree or config.TRACK_VOTE_AGREE
+        self.idle_detect_interval = idle_detect_interval or config.TRACK_IDLE_DETECT_INTERVAL
+        self.redetect_interval = redetect_interval or config.TRACK_REDETECT_INTERVAL
+        self.reidentify_interval = reidentify_interval or config.TRACK_REIDENTIFY_INTERVAL
+        self.min_quality = config.TRACK_MIN_QUALITY if min_quality is None else min_quality
+
+        self.tracks = []
+        self.frame_index = 0
+        self._detected_at = -self.redetect_interval
+        self._next_track_id = 1
+
+        # Statistik untuk melihat berapa frame yang butuh deteksi / encoding
+        self.detections = 0
+        self.identifications = 0
+
+    def process(self, rgb_frame):
+        """Memproses satu frame RGB; mengembalikan daftar track aktif"""
+        self.frame_index += 1
+
+        lost = False
+        for track in list(self.tracks):
+            if track.update(rgb_frame) < self.min_quality:
+                self.tracks.remove(track)
+                lost = True
+
+        # Belum ada wajah: deteksi lebih sering (idle_detect_interval)
+        interval = self.redetect_interval if self.tracks else self.idle_detect_interval
+        if lost or self.frame_index - self._detected_at >= interval:
+            self._detect(rgb_frame)
+
+        self._identify(rgb_frame)
+        return self.tracks
+
+    def _detect(self, rgb_frame):
+        """Deteksi penuh: track dicocokkan ke deteksi lewat IoU"""
+        self.detections += 1
+        self._detected_at = self.frame_index
+        face_locations = detect_faces(rgb_frame)
+
+        tracks = []
+        remaining = list(self.tracks)
+        for box in face_locations:
+            best = max(remaining, key=lambda track: _iou(track.box, box), default=None)
+            if best is not None and _iou(best.box, box) >= TRACK_MATCH_IOU:
+                remaining.remove(best)
+                best.restart(rgb_frame, box)
+                tracks.append(best)
+            else:
+                tracks.append(FaceTrack(self._next_track_id, rgb_frame, box))
+                self._next_track_id += 1
+
+        # Track tanpa deteksi yang cocok dianggap sudah keluar dari frame
+        self.tracks = tracks
+
+    def _identify(self, rgb_frame):
+        """Encoding + pencocokan galeri untuk track yang perlu (re)identifikasi"""
+        pending = []
+        for track in self.tracks:
+            interval = self.reidentify_interval if track.employee_id is not None else self.vote_interval
+            if track.identified_at is None or self.frame_index - track.identified_at >= interval:
+                pending.append(track)
+        if not pending:
+            return
+
+        self.identifications += 1
+        face_encodings = face_recognition.face_encodings(rgb_frame, [track.box for track in pending])
+        for track, face_encoding in zip(pending, face_encodings):
+            track.identified_at = self.frame_index
+
+            best = self.gallery.match(face_encoding, k=1)
+            best_id, distance = best[0] if best else (None, None)
+            track.observations.append((best_id, distance, np.asarray(face_encoding, dtype=np.float32)))
+            self._vote(track)
+
+    def _vote(self, track):
+        """Menetapkan identitas track dari observasi beberapa frame terakhir"""
+        votes = Counter(best_id for best_id, distance, _ in track.observations
+                        if best_id is not None and _is_match(distance))
+        candidate, agree = votes.most_common(1)[0] if votes else (None, 0)
+
+        # Embedding rata-rata lebih stabil dari embedding satu frame
+        mean_encoding = np.mean([encoding for _, _, encoding in track.observations], axis=0)
+        best = self.gallery.match(mean_encoding, k=1)
+        smoothed_id, smoothed_distance = best[0] if best else (None, None)
+        track.distance = smoothed_distance
+
+        if agree >= self.vote_agree:
+            employee_id = candidate
+        elif (len(track.observations) >= self.vote_agree and smoothed_id is not None
+                and _is_match(smoothed_distance)):
+            employee_id = smoothed_id
+        else:
+            return
+
+        if employee_id != track.employee_id:
+            track.employee_id = employee_id
+            track.name = self.gallery.get_name(employee_id)
+            track.announced = False
@@ -0,0 +1,57 @@
+"""
+Fungsi yang dijalankan di worker process inferensi
+Modul ini sengaja tidak mengimpor app_web / database: worker hanya butuh
+model dlib dan pipeline deteksi, bukan state aplikasi web
+"""
+import os
+import numpy as np
+from metrics import metrics
+
+
+def init_worker():
+    """Dijalankan sekali per worker: memuat model dlib dengan inferensi dummy"""
+    import face_recognition
+
+    dummy = np.zeros((64, 64, 3), dtype=np.uint8)
+    face_recognition.face_locations(dummy)
+    face_recognition.face_encodings(dummy, [(0, 63, 63, 0)])
+
+
+def warm_up_job():
+    """Job kosong: memastikan worker sudah berjalan (initializer sudah memuat model)"""
+    return os.getpid()
+
+
+def detect_and_encode(image_bytes):
+    """Decode JPEG lalu deteksi (diperkecil) dan encoding (resolusi asli) semua wajah.
+
+    Mengembalikan (face_locations, face_encodings).
+    """
+    import cv2
+    from face_detection import detect_and_encode_faces
+
+    with metrics.timer('imdecode'):
+        nparr = np.frombuffer(image_bytes, np.uint8)
+        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Gambar tidak valid!")
+        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    return detect_and_encode_faces(rgb_image, still_image=True)
+
+
+def detect_and_encode_batch(images):
+    """detect_and_encode untuk beberapa gambar dalam satu job worker.
+
+    Mengembalikan (results, observations); gambar yang gagal diproses
+    menghasilkan objek exception di posisinya, observations berisi durasi
+    tiap tahap untuk dicatat di metrik process utama.
+    """
+    results = []
+    with metrics.capture() as observations:
+        for image_bytes in images:
+            try:
+                results.append(detect_and_encode(image_bytes))
+            except Exception as e:
+                results.append(e)
+    return results, observations
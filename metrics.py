@@ -0,0 +1,168 @@
+"""
+Metrik latensi pipeline pengenalan wajah (format teks Prometheus)
+Durasi setiap tahap dikumpulkan dalam histogram di memori process
+"""
+import bisect
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+import config
+
+# Batas bucket histogram (detik), dari decode base64 hingga inferensi lambat
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """Histogram kumulatif dengan satu label (mis. stage atau endpoint)"""
+
+    def __init__(self, name, help_text, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # nilai label -> [counts per bucket, sum, count]
+
+    def observe(self, label_value, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {label: (list(counts), total, count)
+                      for label, (counts, total, count) in self._series.items()}
+
+        for label_value in sorted(series):
+            counts, total, count = series[label_value]
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label},le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {_format_value(total)}")
+            lines.append(f"{self.name}_count{{{label}}} {count}")
+        return lines
+
+
+class Metrics:
+    """Registry metrik satu process.
+
+    timer(stage) mengukur satu tahap pipeline. Di worker process, observasi
+    ditampung lewat capture() lalu dikirim balik bersama hasil job dan
+    dicatat di process utama dengan record().
+    """
+
+    def __init__(self):
+        self.stage_seconds = Histogram('absensi_stage_seconds',
+                                       'Durasi setiap tahap pipeline pengenalan wajah', 'stage')
+        self.request_seconds = Histogram('absensi_request_seconds',
+                                         'Durasi request HTTP per endpoint', 'endpoint')
+        self._collectors = []  # (name, help, type, func)
+        self._local = threading.local()
+
+    def observe(self, stage, seconds):
+        captured = getattr(self._local, 'captured', None)
+        if captured is not None:
+            captured.append((stage, seconds))
+        else:
+            self.stage_seconds.observe(stage, seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    @contextmanager
+    def capture(self):
+        """Menampung observasi di thread ini ke list (untuk dikirim dari worker)"""
+        previous = getattr(self._local, 'captured', None)
+        observations = self._local.captured = []
+        try:
+            yield observations
+        finally:
+            self._local.captured = previous
+
+    def record(self, observations):
+        """Mencatat observasi yang dikirim dari worker process"""
+        for stage, seconds in observations:
+            self.observe(stage, seconds)
+
+    def register(self, name, help_text, func, metric_type='gauge'):
+        """Metrik yang nilainya dibaca saat /metrics diminta; func mengembalikan angka"""
+        self._collectors.append((name, help_text, metric_type, func))
+
+    def render(self):
+        """Semua metrik dalam format teks Prometheus"""
+        lines = []
+        for name, help_text, metric_type, func in self._collectors:
+            try:
+                value = func()
+            except Exception as e:
+                print(f"Error collecting metric {name}: {e}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.append(f"{name} {_format_value(value)}")
+        lines.extend(self.stage_seconds.render())
+        lines.extend(self.request_seconds.render())
+        return '\n'.join(lines) + '\n'
+
+
+class SlowRequestProfiler:
+    """cProfile per request; hasil hanya disimpan jika request lebih lambat dari threshold"""
+
+    def __init__(self, enabled=None, threshold_ms=None, directory=None):
+        self.enabled = config.PROFILE_SLOW_REQUESTS if enabled is None else enabled
+        self.threshold = (config.PROFILE_SLOW_REQUEST_MS if threshold_ms is None else threshold_ms) / 1000.0
+        self.directory = directory or config.PROFILE_DIR
+
+    def start(self):
+        """Mulai profiling request ini; None jika nonaktif atau profiler lain sedang aktif"""
+        if not self.enabled:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return None
+        return profile
+
+    def stop(self, profile, elapsed, label):
+        """Menghentikan profiling; menulis file .prof jika request lambat"""
+        if profile is None:
+            return None
+        profile.disable()
+        if elapsed < self.threshold:
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-{elapsed * 1000:.0f}ms.prof")
+        profile.dump_stats(path)
+        print(f"Request lambat ({elapsed * 1000:.0f} ms), profil disimpan: {path}")
+        return path
+
+
+# Registry bersama untuk process ini (worker process punya salinannya sendiri)
+metrics = Metrics()
@@ -0,0 +1,88 @@
+"""
+Warm-up pipeline pengenalan wajah di background
+Halaman ringan (dashboard, daftar pegawai, riwayat) bisa dilayani segera,
+sementara galeri dan model dlib dimuat di thread terpisah
+"""
+import threading
+import time
+
+
+class PipelineWarmup:
+    """Menjalankan langkah-langkah warm-up berurutan di satu thread.
+
+    Setiap langkah punya Event sendiri sehingga request bisa menunggu
+    langkah tertentu saja (mis. hanya galeri) dengan wait(step=...).
+    """
+
+    def __init__(self, steps):
+        self.steps = list(steps)  # [(nama, fungsi)]
+        self._done = {name: threading.Event() for name, _ in self.steps}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.state = 'cold'  # cold -> loading -> ready / failed
+        self.current = None
+        self.error = None
+        self.durations = {}
+        self._succeeded = set()
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def start(self):
+        """Memulai warm-up di background (hanya sekali)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.state = 'loading'
+            self._thread = threading.Thread(target=self._run, name="pipeline-warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        started = time.perf_counter()
+        for name, func in self.steps:
+            self.current = name
+            step_started = time.perf_counter()
+            try:
+                func()
+            except Exception as e:
+                self.error = f"{name}: {e}"
+                print(f"Error warm-up ({name}): {e}")
+                break
+            finally:
+                self.durations[name] = round(time.perf_counter() - step_started, 3)
+            self._succeeded.add(name)
+            self._done[name].set()
+
+        self.current = None
+        if self.error is None:
+            self.state = 'ready'
+            print(f"Pipeline pengenalan wajah siap dalam {time.perf_counter() - started:.1f} detik")
+        else:
+            self.state = 'failed'
+
+        # Langkah yang gagal / tidak sempat dijalankan: jangan biarkan request menunggu
+        for event in self._done.values():
+            event.set()
+
+    def wait(self, timeout=None, step=None):
+        """Menunggu warm-up (atau satu langkah) selesai; True jika berhasil"""
+        self.start()
+        names = [step] if step is not None else list(self._done)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for name in names:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self._done[name].wait(remaining):
+                return False
+        return all(name in self._succeeded for name in names)
+
+    def status(self):
+        """Status untuk endpoint readiness"""
+        return {
+            'ready': self.ready,
+            'state': self.state,
+            'current_step': self.current,
+            'steps': {name: {'done': name in self._succeeded, 'seconds': self.durations.get(name)}
+                      for name, _ in self.steps},
+            'error': self.error,
+        }
@@ -0,0 +1,155 @@
+"""
+Micro-batching untuk request pengenalan wajah
+Request yang datang berdekatan dikumpulkan menjadi satu batch, diproses
+di worker pool, lalu dicocokkan ke galeri dengan satu perhitungan matriks
+"""
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+import numpy as np
+import config
+from metrics import metrics
+from inference_worker import detect_and_encode, detect_and_encode_batch
+from recognition_service import QueueFullError
+
+
+class RecognitionBatcher:
+    """Mengumpulkan request recognize hingga max_batch_size atau max_wait_ms.
+
+    Satu batch dibagi ke beberapa job worker (sebanyak worker pool) supaya
+    semua core tetap terpakai; begitu satu job selesai, encoding wajah pertama
+    dari tiap request di job itu dicocokkan ke galeri dengan satu match_batch()
+    dan hasilnya langsung dikirim, tanpa menunggu job lain di batch yang sama.
+    Tanpa worker pool (workers=0) request tidak melewati batcher sama sekali.
+    """
+
+    def __init__(self, service, gallery, max_batch_size=None, max_wait_ms=None):
+        self.service = service
+        self.gallery = gallery
+        self.max_batch_size = max(1, max_batch_size or config.BATCH_MAX_SIZE)
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else config.BATCH_MAX_WAIT_MS) / 1000.0
+
+        self._queue = queue.Queue(maxsize=service.queue_size * self.max_batch_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="recognition-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, image_bytes):
+        """Memasukkan gambar ke antrian batch; QueueFullError jika antrian penuh"""
+        self.start()
+        future = Future()
+        try:
+            self._queue.put_nowait((image_bytes, future))
+        except queue.Full:
+            raise QueueFullError("Antrian pengenalan wajah penuh")
+        return future
+
+    def recognize(self, image_bytes, timeout=None):
+        """Deteksi, encoding, dan pencocokan satu gambar.
+
+        Mengembalikan (face_locations, face_encodings, best) dengan best berisi
+        hasil match(k=1) untuk wajah pertama. timeout None = INFERENCE_TIMEOUT.
+        """
+        if self.service.workers == 0:
+            return self._recognize_inline(image_bytes, timeout)
+        return self.service.wait(self.submit(image_bytes), timeout)
+
+    def _recognize_inline(self, image_bytes, timeout):
+        """workers=0: inferensi langsung di thread request, paralel antar request"""
+        future = self.service.submit(detect_and_encode, image_bytes)
+        face_locations, face_encodings = self.service.wait(future, timeout)
+        best = []
+        if len(face_encodings) > 0:
+            with metrics.timer('match'):
+                best = self.gallery.match(face_encodings[0], k=1)
+        return face_locations, face_encodings, best
+
+    def stats(self):
+        """Statistik ukuran batch yang tercapai"""
+        with self._stats_lock:
+            sizes = dict(sorted(self._batch_sizes.items()))
+        batches = sum(sizes.values())
+        requests = sum(size * count for size, count in sizes.items())
+        return {
+            'batches': batches,
+            'requests': requests,
+            'mean_batch_size': round(requests / batches, 2) if batches else 0.0,
+            'batch_size_histogram': sizes,
+            'queue_depth': self._queue.qsize(),
+        }
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            with self._stats_lock:
+                self._batch_sizes[len(batch)] += 1
+            self._dispatch(batch)
+
+    def _dispatch(self, items):
+        """Membagi batch ke job worker; menunggu slot jika pool penuh"""
+        parts = max(1, min(self.service.workers, len(items)))
+        bounds = np.linspace(0, len(items), parts + 1).astype(int)
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            chunk = items[start:end]
+            images = [image_bytes for image_bytes, _ in chunk]
+            try:
+                future = self.service.submit(detect_and_encode_batch, images, block=True)
+            except Exception as e:
+                self._chunk_done(chunk, error=e)
+                continue
+            future.add_done_callback(lambda f, chunk=chunk: self._chunk_done(chunk, future=f))
+
+    def _chunk_done(self, items, future=None, error=None):
+        """Mencocokkan encoding satu job ke galeri lalu langsung membagikan hasilnya"""
+        if error is None:
+            try:
+                results, observations = future.result()
+                metrics.record(observations)
+            except Exception as e:
+                error = e
+        if error is not None:
+            results = [error] * len(items)
+
+        matched = [i for i, result in enumerate(results)
+                   if not isinstance(result, Exception) and len(result[1]) > 0]
+        try:
+            with metrics.timer('match'):
+                best = self.gallery.match_batch([results[i][1][0] for i in matched], k=1)
+        except Exception as e:
+            best = [e] * len(matched)
+        best_by_item = dict(zip(matched, best))
+
+        for i, (_, future) in enumerate(items):
+            # Request yang sudah timeout (future dibatalkan) dilewati
+            if not future.set_running_or_notify_cancel():
+                continue
+            result = results[i]
+            match = best_by_item.get(i, [])
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            elif isinstance(match, Exception):
+                future.set_exception(match)
+            else:
+                face_locations, face_encodings = result
+                future.set_result((face_locations, face_encodings, match))
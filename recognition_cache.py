@@ -0,0 +1,208 @@
+"""
+Cache hasil pengenalan wajah untuk frame yang dikirim ulang
+Kiosk sering mengirim frame yang hampir sama (user mencoba lagi, JS terpicu
+beberapa kali); hasil deteksi + encoding frame tersebut dipakai ulang
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import config
+
+# Ukuran grid dHash: HASH_SIZE x HASH_SIZE bit (16 -> 256 bit)
+HASH_SIZE = 16
+
+
+def _dhash(gray):
+    import cv2
+
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    return np.packbits(small[:, 1:] > small[:, :-1])
+
+
+def _hamming(a, b):
+    return int(np.unpackbits(np.bitwise_xor(a, b)).sum())
+
+
+def perceptual_hash(image_bytes):
+    """dHash dari versi grayscale kecil gambar; None jika gambar tidak bisa dibaca.
+
+    JPEG di-decode langsung pada 1/8 resolusi sehingga jauh lebih murah dari
+    decode penuh. Frame yang hampir sama menghasilkan hash dengan sedikit bit berbeda.
+    """
+    import cv2
+
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    gray = cv2.imdecode(nparr, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if gray is None:
+        return None
+    return _dhash(gray)
+
+
+def face_hash(image_bytes, face_location):
+    """dHash area wajah (top, right, bottom, left) pada gambar; None jika tidak bisa dibaca.
+
+    Hash seluruh frame hampir tidak berubah jika hanya wajah di tengah frame
+    yang berganti (kamera kiosk diam), jadi identitas dicocokkan dari area wajah.
+    """
+    import cv2
+
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    gray = cv2.imdecode(nparr, cv2.IMREAD_REDUCED_GRAYSCALE_2)
+    if gray is None:
+        return None
+    top, right, bottom, left = (max(0, int(value) // 2) for value in face_location)
+    crop = gray[top:bottom, left:right]
+    if crop.shape[0] < 2 or crop.shape[1] < 2:
+        return None
+    return _dhash(crop)
+
+
+class RecognitionCache:
+    """Cache LRU + TTL untuk hasil (face_locations, face_encodings, best).
+
+    key_mode 'exact' hanya mencocokkan byte gambar yang identik. 'perceptual'
+    mencari frame dengan jarak Hamming dHash paling banyak max_hamming bit,
+    lalu area wajah pertama pada frame baru harus berbeda paling banyak
+    max_face_hamming bit dari area wajah yang disimpan; jika tidak, frame
+    dianggap orang lain dan hasil cache tidak dipakai.
+    Encoding wajah tidak bergantung pada galeri, jadi saat galeri berubah
+    (generation berbeda) hanya hasil pencocokan yang dihitung ulang.
+    """
+
+    def __init__(self, gallery, max_entries=None, ttl=None, key_mode=None, max_hamming=None,
+                 max_face_hamming=None):
+        self.gallery = gallery
+        self.max_entries = config.RECOGNITION_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = config.RECOGNITION_CACHE_TTL if ttl is None else ttl
+        self.key_mode = key_mode or config.RECOGNITION_CACHE_KEY
+        self.max_hamming = config.RECOGNITION_CACHE_MAX_HAMMING if max_hamming is None else max_hamming
+        if max_face_hamming is None:
+            max_face_hamming = config.RECOGNITION_CACHE_MAX_FACE_HAMMING
+        self.max_face_hamming = max_face_hamming
+
+        self._lock = threading.Lock()
+        # key -> [expires_at, face_locations, face_encodings, best, generation, face_key]
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.rematches = 0
+        self.face_mismatches = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl > 0
+
+    def key(self, image_bytes):
+        """Key cache untuk gambar; None jika gambar tidak bisa di-hash"""
+        if self.key_mode == 'exact':
+            return hashlib.sha256(image_bytes).digest()
+        phash = perceptual_hash(image_bytes)
+        return phash.tobytes() if phash is not None else None
+
+    def get(self, key, image_bytes=None):
+        """Hasil cache untuk key, atau None (miss). image_bytes dibutuhkan mode 'perceptual'."""
+        if key is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry_key = self._find(key)
+            # Entry yang pernah di-hit bisa sudah kedaluwarsa meski tidak di depan
+            if entry_key is not None and self._entries[entry_key][0] <= now:
+                del self._entries[entry_key]
+                entry_key = None
+            entry = self._entries[entry_key] if entry_key is not None else None
+
+        # Frame mirip belum tentu orang yang sama: area wajah dicocokkan di luar lock
+        if entry is not None and not self._same_face(entry, image_bytes):
+            with self._lock:
+                self.face_mismatches += 1
+                if self._entries.get(entry_key) is entry:
+                    del self._entries[entry_key]
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry_key in self._entries:
+                self._entries.move_to_end(entry_key)
+            self.hits += 1
+            _, face_locations, face_encodings, best, generation, _ = entry
+
+        # Galeri sudah berubah: encoding tetap valid, pencocokan diulang
+        current = self.gallery.generation
+        if generation != current:
+            best = self.gallery.match(face_encodings[0], k=1) if len(face_encodings) > 0 else []
+            with self._lock:
+                self.rematches += 1
+                entry[3], entry[4] = best, current
+        return face_locations, face_encodings, best
+
+    def put(self, key, result, generation, image_bytes=None):
+        """Menyimpan hasil recognize; generation = gallery.generation sebelum pencocokan"""
+        if key is None:
+            return
+        face_locations, face_encodings, best = result
+        face_key = None
+        if self.key_mode != 'exact' and len(face_locations) > 0:
+            face_key = face_hash(image_bytes, face_locations[0]) if image_bytes is not None else None
+            if face_key is None:
+                return
+        with self._lock:
+            self._entries[key] = [time.monotonic() + self.ttl, face_locations, face_encodings, best,
+                                  generation, face_key]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _same_face(self, entry, image_bytes):
+        """True jika area wajah entry pada frame baru masih wajah yang sama"""
+        face_locations, face_key = entry[1], entry[5]
+        if self.key_mode == 'exact' or len(face_locations) == 0:
+            return True
+        if image_bytes is None:
+            return False
+        current = face_hash(image_bytes, face_locations[0])
+        return current is not None and _hamming(current, face_key) <= self.max_face_hamming
+
+    def _find(self, key):
+        """Key entry yang cocok (identik, atau dHash cukup dekat). Dipanggil dengan _lock terkunci."""
+        if key in self._entries:
+            return key
+        if self.key_mode == 'exact' or not self._entries:
+            return None
+
+        keys = list(self._entries)
+        hashes = np.frombuffer(b''.join(keys), dtype=np.uint8).reshape(len(keys), -1)
+        distances = np.unpackbits(hashes ^ np.frombuffer(key, dtype=np.uint8), axis=1).sum(axis=1)
+        best = int(np.argmin(distances))
+        return keys[best] if distances[best] <= self.max_hamming else None
+
+    def _expire(self, now):
+        # Membuang entry kedaluwarsa dari depan (urutan LRU, cukup untuk membatasi memori)
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry[0] > now:
+                break
+            del self._entries[key]
+
+    def stats(self):
+        """Statistik hit/miss cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'rematches': self.rematches,
+                'face_mismatches': self.face_mismatches,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
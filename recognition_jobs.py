@@ -0,0 +1,123 @@
+"""
+Job pengenalan wajah asinkron
+Request recognize langsung dijawab dengan job ID, hasilnya diambil lewat
+polling / long-polling, sehingga deteksi lambat (CNN di CPU) tidak menahan
+koneksi HTTP dan tidak terkena timeout proxy
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import config
+from recognition_service import QueueFullError
+
+
+class RecognitionJob:
+    """Satu job pengenalan; result = (payload, status_code) setelah selesai"""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = 'pending'  # pending -> running -> done
+        self.result = None
+        self.created_at = time.monotonic()
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Menunggu job selesai; True jika sudah selesai"""
+        return self._done.wait(timeout)
+
+
+class RecognitionJobs:
+    """Menjalankan job di thread pool dan menyimpan hasilnya selama ttl detik.
+
+    Setiap job yang belum selesai menyimpan gambarnya di memori, jadi job
+    baru langsung ditolak (QueueFullError) jika sudah ada max_pending job
+    yang belum selesai atau saturated() mengembalikan True (antrian worker
+    inferensi penuh), bukan diterima lalu gagal belakangan.
+    """
+
+    def __init__(self, workers=None, max_pending=None, ttl=None, saturated=None):
+        self.workers = workers or config.ASYNC_JOB_WORKERS
+        if max_pending is None:
+            max_pending = config.ASYNC_MAX_PENDING_JOBS or config.INFERENCE_QUEUE_SIZE
+        self.max_pending = max_pending
+        self.ttl = config.ASYNC_JOB_TTL if ttl is None else ttl
+        self.saturated = saturated
+
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # job_id -> RecognitionJob (urut waktu submit)
+        self._pending = 0
+        self._executor = None
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(self, func, *args, **kwargs):
+        """Menjadwalkan func(*args, **kwargs) -> (payload, status_code); QueueFullError jika penuh"""
+        with self._lock:
+            self._expire(time.monotonic())
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise QueueFullError(f"{self._pending} job pengenalan masih menunggu")
+            if self.saturated is not None and self.saturated():
+                self.rejected += 1
+                raise QueueFullError("Antrian pengenalan wajah penuh")
+            job = RecognitionJob(secrets.token_urlsafe(16))
+            self._jobs[job.id] = job
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix="recognition-job")
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        job.status = 'running'
+        try:
+            job.result = func(*args, **kwargs)
+        except Exception as e:
+            print(f"Error job pengenalan {job.id}: {e}")
+            job.result = ({'success': False, 'message': f'Error: {str(e)}'}, 500)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.completed += 1
+            job.finished_at = time.monotonic()
+            job.status = 'done'
+            job._done.set()
+
+    def get(self, job_id):
+        """Job dengan ID ini, atau None jika tidak ada / sudah kedaluwarsa"""
+        with self._lock:
+            self._expire(time.monotonic())
+            return self._jobs.get(job_id)
+
+    def _expire(self, now):
+        # Hanya job yang sudah selesai yang dibuang; job berjalan dibatasi ASYNC_INFERENCE_TIMEOUT
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at + self.ttl <= now]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def stats(self):
+        """Statistik job asinkron"""
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'stored': len(self._jobs),
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,132 @@
+"""
+Layanan inferensi face recognition
+Menjalankan decode -> deteksi -> encoding di pool worker process terpisah
+(cv2 / face_recognition baru diimpor saat inferensi pertama atau warm-up)
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import config
+from inference_worker import init_worker, warm_up_job, detect_and_encode
+
+
+class QueueFullError(Exception):
+    """Antrian inferensi penuh, request harus ditolak (HTTP 503)"""
+
+
+class InferenceTimeoutError(Exception):
+    """Job inferensi melebihi batas waktu"""
+
+
+class RecognitionService:
+    """Pool worker process untuk inferensi dlib.
+
+    Jumlah job yang menunggu/berjalan dibatasi queue_size; submit() langsung
+    menolak job baru (QueueFullError) saat antrian penuh sehingga request tidak
+    menumpuk. workers=0 menjalankan inferensi langsung di thread pemanggil.
+    """
+
+    def __init__(self, workers=None, queue_size=None, timeout=None):
+        if workers is None:
+            workers = config.INFERENCE_WORKERS
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self.queue_size = queue_size or config.INFERENCE_QUEUE_SIZE
+        self.timeout = timeout or config.INFERENCE_TIMEOUT
+
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._executor = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def queue_depth(self):
+        """Jumlah job yang sedang menunggu atau berjalan"""
+        return self._pending
+
+    def start(self):
+        """Membuat pool worker (dipanggil otomatis saat job pertama)"""
+        with self._start_lock:
+            if self._executor is None and self.workers > 0:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=init_worker,
+                    mp_context=multiprocessing.get_context(config.INFERENCE_START_METHOD))
+
+    def _restart(self, broken):
+        """Mengganti pool yang rusak (worker mati, mis. kehabisan memori) dengan pool baru"""
+        with self._start_lock:
+            if self._executor is broken:
+                print("Pool worker inferensi rusak, membuat pool baru")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+        self.start()
+
+    def warm_up(self):
+        """Menyalakan semua worker (masing-masing memuat model dlib lewat
+        initializer) sebelum request pertama; mengembalikan jumlah worker.
+
+        Dengan workers=0 model dimuat di process ini karena inferensi berjalan di sini.
+        """
+        if self.workers == 0:
+            init_worker()
+            return 0
+        self.start()
+        for future in [self._executor.submit(warm_up_job) for _ in range(self.workers)]:
+            future.result()
+        return self.workers
+
+    def shutdown(self):
+        with self._start_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def submit(self, func, *args, block=False):
+        """Mengirim job ke pool; QueueFullError jika antrian penuh (kecuali block=True)"""
+        if not self._slots.acquire(blocking=block):
+            raise QueueFullError("Antrian pengenalan wajah penuh")
+        with self._pending_lock:
+            self._pending += 1
+
+        try:
+            if self.workers > 0:
+                self.start()
+                executor = self._executor
+                try:
+                    future = executor.submit(func, *args)
+                except BrokenProcessPool:
+                    self._restart(executor)
+                    future = self._executor.submit(func, *args)
+            else:
+                future = Future()
+                try:
+                    future.set_result(func(*args))
+                except Exception as e:
+                    future.set_exception(e)
+        except Exception:
+            self._release()
+            raise
+
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self):
+        with self._pending_lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def wait(self, future, timeout=None):
+        """Menunggu hasil job; InferenceTimeoutError jika melewati batas waktu"""
+        try:
+            return future.result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise InferenceTimeoutError("Pengenalan wajah melebihi batas waktu")
+
+    def detect_and_encode(self, image_bytes):
+        """Decode -> deteksi -> encoding satu gambar di worker pool"""
+        return self.wait(self.submit(detect_and_encode, image_bytes))